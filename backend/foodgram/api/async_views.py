@@ -0,0 +1,144 @@
+"""Асинхронные обработчики чтения для режима ASGI (SERVER_MODE=asgi).
+
+Анонимные GET и HEAD к рецептам, тегам и ингредиентам обслуживаются в
+цикле событий: ответ берётся из кэша ответов (api.response_cache), а
+список и карточка ингредиента строятся из снимка справочника в памяти
+(api.search). В Django 3.2 у ORM и кэша нет асинхронного API, поэтому
+обращения к ним идут через sync_to_async. Всё остальное — запросы с
+токеном, изменения, промахи кэша, браузерный API — передаётся
+синхронным вьюхам DRF.
+
+Синхронный код по умолчанию выполняется в единственном общем потоке
+процесса, поэтому вьюхи API запускаются в пуле потоков asgiref
+(thread_sensitive=False); соединение с БД у каждого потока своё и
+проверяется до и после запроса, как это делают сигналы request_started и
+request_finished в своём потоке.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import Http404, HttpResponse
+from django.urls import URLPattern
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import generations, response_cache
+from .conditional import make_validators
+from .search import load_snapshot
+from .views import RecipeViewSet, TagViewSet
+
+ALLOW = 'GET, HEAD, OPTIONS'
+JSON_MEDIA_TYPES = ('', '*/*', 'application/json')
+
+
+def accepts_json(request):
+    """Запрос, на который DRF ответил бы JSONRenderer."""
+    if 'format' in request.GET:
+        return False
+    accept = request.META.get('HTTP_ACCEPT', '')
+    return all(media_type.split(';')[0].strip() in JSON_MEDIA_TYPES
+               for media_type in accept.split(','))
+
+
+def is_anonymous_read(request):
+    return response_cache.is_cacheable(request) and accepts_json(request)
+
+
+def in_worker(function):
+    """Выполняет function в пуле потоков с проверкой соединения с БД."""
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(run, thread_sensitive=False)
+
+
+def async_read_view(view, fast_path=None):
+    """Возвращает асинхронную вьюху: fast_path(request, **kwargs) для
+    анонимного чтения или, если его нет или он вернул None, синхронный
+    view в пуле потоков."""
+    sync_view = in_worker(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if (fast_path is not None and 'format' not in kwargs
+                and is_anonymous_read(request)):
+            response = await fast_path(request, **kwargs)
+            if response is not None:
+                return response
+        return await sync_view(request, *args, **kwargs)
+    wrapper.csrf_exempt = True
+    return wrapper
+
+
+def cached(get_scopes):
+    """fast_path, отдающий ответ из кэша ответов вьюсета."""
+    @in_worker
+    def fast_path(request, **kwargs):
+        response = response_cache.get(
+            response_cache.make_key(request, get_scopes(kwargs)))
+        if response is None:
+            return None
+        return response_cache.conditional(request, response)
+    return fast_path
+
+
+@in_worker
+def get_snapshot_response(request, content_getter):
+    version = generations.get(generations.INGREDIENTS)
+    etag, last_modified = make_validators(request, (generations.INGREDIENTS,))
+    response = get_conditional_response(
+        request, etag=quote_etag(etag), last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(content_getter(load_snapshot(version)),
+                                content_type='application/json')
+        response['Allow'] = ALLOW
+        patch_vary_headers(response, ('Accept',))
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+async def ingredient_list(request, **kwargs):
+    name = request.GET.get('name')
+    return await get_snapshot_response(
+        request, lambda snapshot: snapshot.render(
+            snapshot.ranked(name) if name else snapshot.ids))
+
+
+async def ingredient_detail(request, pk, **kwargs):
+    def render(snapshot):
+        fragment = snapshot.fragments.get(int(pk) if pk.isdigit() else None)
+        if fragment is None:
+            raise Http404
+        return fragment
+    try:
+        return await get_snapshot_response(request, render)
+    except Http404:
+        return None
+
+
+FAST_PATHS = {
+    'recipe-list': cached(RecipeViewSet.get_scopes),
+    'recipe-detail': cached(RecipeViewSet.get_scopes),
+    'tag-list': cached(lambda kwargs: TagViewSet.cache_scopes),
+    'tag-detail': cached(lambda kwargs: TagViewSet.cache_scopes),
+    'ingredient-list': ingredient_list,
+    'ingredient-detail': ingredient_detail,
+}
+
+
+def wrap_urls(urls):
+    """Подменяет вьюхи асинхронными обёртками, для имён из FAST_PATHS —
+    с быстрым путём."""
+    return [
+        URLPattern(url.pattern, async_read_view(
+            url.callback, FAST_PATHS.get(url.name)), url.default_args,
+            url.name)
+        for url in urls
+    ]
@@ -0,0 +1,107 @@
+"""Аутентификация по токену с кэшем.
+
+TokenAuthentication DRF на каждый запрос выбирает токен вместе с
+пользователем. Здесь найденный токен хранится в LRU процесса с коротким
+TTL и, если включено TOKEN_CACHE_SHARED, в общем кэше Django. Удаление
+токена (выход) и любое изменение пользователя (в том числе деактивация)
+сразу убирают записи из общего кэша и из LRU текущего процесса, а в
+общем кэше остаётся отметка с временем отзыва. Каждая запись хранит
+время, когда токен был прочитан из БД (до запроса), и при попадании в
+LRU или в общий кэш сверяется с отметкой: записи, прочитанные раньше
+отзыва, не отдаются, даже если запрос, начатый до выхода, записал их в
+кэш уже после него. Отметка живёт дольше любой такой записи.
+"""
+import copy
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .response_cache import LRUCache
+
+KEY = 'auth_token:{}'
+REVOKED_KEY = '{}:revoked'
+
+local_cache = LRUCache(settings.TOKEN_CACHE_SIZE)
+
+
+def get_key(token_key):
+    return KEY.format(hashlib.sha256(token_key.encode()).hexdigest())
+
+
+def set_local(cache_key, token, read_at):
+    local_cache.set(cache_key, (
+        time.monotonic() + settings.TOKEN_CACHE_TTL, read_at, token))
+
+
+def is_revoked(revoked_at, read_at):
+    """Токен отозван после того, как запись о нём была прочитана из БД."""
+    return revoked_at is not None and revoked_at >= read_at
+
+
+def get_revoked_ttl():
+    """Отметка переживает любую запись, прочитанную до отзыва: запись в
+    общем кэше, сделанную вскоре после отзыва, и её копию в LRU."""
+    return settings.TOKEN_CACHE_SHARED_TTL + settings.TOKEN_CACHE_TTL + 1
+
+
+def evict(token_keys):
+    keys = [get_key(token_key) for token_key in token_keys]
+    if not keys:
+        return
+    for key in keys:
+        local_cache.delete(key)
+    revoked_at = time.time()
+    cache.set_many({REVOKED_KEY.format(key): revoked_at for key in keys},
+                   get_revoked_ttl())
+    if settings.TOKEN_CACHE_SHARED:
+        cache.delete_many(keys)
+
+
+def evict_user(user_id):
+    evict(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication, которая обращается к БД только при промахе
+    кэша."""
+
+    def authenticate_credentials(self, key):
+        cache_key = get_key(key)
+        token = self.get_cached(cache_key)
+        if token is None:
+            read_at = time.time()
+            _, token = super().authenticate_credentials(key)
+            self.store(cache_key, token, read_at)
+        return copy.copy(token.user), token
+
+    @staticmethod
+    def get_cached(cache_key):
+        revoked_key = REVOKED_KEY.format(cache_key)
+        entry = local_cache.get(cache_key)
+        if entry is not None:
+            expires, read_at, token = entry
+            if (expires > time.monotonic()
+                    and not is_revoked(cache.get(revoked_key), read_at)):
+                return token
+            local_cache.delete(cache_key)
+        if not settings.TOKEN_CACHE_SHARED:
+            return None
+        found = cache.get_many([cache_key, revoked_key])
+        if cache_key not in found:
+            return None
+        read_at, token = found[cache_key]
+        if is_revoked(found.get(revoked_key), read_at):
+            return None
+        set_local(cache_key, token, read_at)
+        return token
+
+    @staticmethod
+    def store(cache_key, token, read_at):
+        set_local(cache_key, token, read_at)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(cache_key, (read_at, token),
+                      settings.TOKEN_CACHE_SHARED_TTL)
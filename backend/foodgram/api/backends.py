@@ -1,17 +1,80 @@
+"""Вход по email и паролю.
+
+Проверка пароля — самая дорогая операция API, поэтому она выполняется в
+пуле из LOGIN_HASH_WORKERS потоков (hashlib отпускает GIL), а ждать
+очереди могут не больше LOGIN_HASH_QUEUE_SIZE входов на процесс;
+остальные сразу получают 429, не занимая воркер. Для несуществующего
+email проверяется заранее посчитанный фиктивный хэш, чтобы по времени
+ответа нельзя было узнать, зарегистрирован ли адрес. Пользователь
+загружается одним запросом и не кэшируется: хэш пароля не должен
+попадать в общий кэш. Если хэш сохранён не предпочтительным хэшером (см.
+PASSWORD_HASHERS), после успешного входа он пересчитывается.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import lru_cache
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.crypto import get_random_string
+from rest_framework.exceptions import Throttled
 from users.models import User
 
+BUSY_MESSAGE = 'Слишком много попыток входа, повторите позже.'
+
+executor = ThreadPoolExecutor(max_workers=settings.LOGIN_HASH_WORKERS,
+                              thread_name_prefix='password')
+slots = threading.BoundedSemaphore(settings.LOGIN_HASH_QUEUE_SIZE)
+
+
+@lru_cache(maxsize=1)
+def get_dummy_hash():
+    return make_password(get_random_string(32))
+
+
+def verify(password, encoded):
+    """Возвращает (пароль верен, новый хэш или None)."""
+    rehashed = []
+    is_correct = check_password(
+        password, encoded,
+        setter=lambda raw: rehashed.append(make_password(raw)))
+    return is_correct, rehashed[0] if rehashed else None
+
+
+def verify_in_pool(password, encoded):
+    if not slots.acquire(blocking=False):
+        raise Throttled(detail=BUSY_MESSAGE)
+    future = executor.submit(verify, password, encoded)
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=settings.LOGIN_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        raise Throttled(detail=BUSY_MESSAGE)
+
+
+def get_user(email):
+    """Email уникален с учётом регистра, поэтому ищется точным
+    совпадением."""
+    return User.objects.filter(email=email).first()
+
 
 class EmailBackend(ModelBackend):
     """Для изменения бэкенд-авторизации"""
     @staticmethod
     def authenticate(request, email=None, password=None, **kwargs):
-        UserModel = User
-        try:
-            user = UserModel.objects.get(email=email)
-        except UserModel.DoesNotExist:
+        if email is None or password is None:
+            return None
+        user = get_user(email)
+        if user is None:
+            verify_in_pool(password, get_dummy_hash())
+            return None
+        is_correct, rehashed = verify_in_pool(password, user.password)
+        if not is_correct:
             return None
-        else:
-            if user.check_password(password):
-                return user
-        return None
+        if rehashed is not None:
+            User.objects.filter(
+                pk=user.pk, password=user.password).update(password=rehashed)
+            user.password = rehashed
+        return user
@@ -0,0 +1,171 @@
+"""Быстрая сериализация только для чтения.
+
+Обычный сериализатор DRF на каждой строке заново обходит свои поля,
+разбирает source, ловит исключения в get_attribute и собирает
+OrderedDict, а RecipeSerializer к тому же создаёт по GetRecipeSerializer
+на каждый рецепт. CompiledSerializer превращает поля исходного
+сериализатора в список пар (имя, функция) и дальше только вызывает эти
+функции. Значения преобразуются теми же to_representation, что и в
+исходном сериализаторе, поэтому JSON получается байт в байт тем же.
+
+План строится один раз на класс сериализатора в каждом потоке. Поля и
+методы сериализатора берут контекст у корневого сериализатора
+(Field.context), поэтому перед вызовом в корень плана подставляется
+контекст запроса, а после — убирается. Отдельный план на поток нужен,
+чтобы параллельные запросы не видели чужой контекст.
+
+Поддерживаются поля моделей, вложенные сериализаторы (в том числе
+many=True), SerializerMethodField и PrimaryKeyRelatedField. Поля со
+source='*' и прочие связанные поля обрабатываются штатными
+get_attribute и to_representation поля.
+"""
+import threading
+from functools import lru_cache
+from operator import attrgetter
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.fields import get_attribute
+
+
+@lru_cache(maxsize=None)
+def get_accessor(source):
+    return attrgetter(source)
+
+
+def get_converter(field):
+    """Самое дешёвое преобразование, равное field.to_representation."""
+    to_representation = type(field).to_representation
+    if to_representation is serializers.ReadOnlyField.to_representation:
+        return None
+    if to_representation is serializers.CharField.to_representation:
+        return str
+    if to_representation is serializers.IntegerField.to_representation:
+        return int
+    return field.to_representation
+
+
+def is_plain(serializer):
+    """Сериализатор не переопределяет to_representation."""
+    return (type(serializer).to_representation
+            is serializers.Serializer.to_representation)
+
+
+def compile_fields(serializer):
+    """Возвращает [(имя, функция от объекта)] для полей на чтение."""
+    if not is_plain(serializer):
+        raise TypeError(
+            f'{type(serializer).__name__} переопределяет to_representation.')
+    return [(field.field_name, compile_field(field))
+            for field in serializer._readable_fields]
+
+
+def serialize(fields, instance):
+    return {name: read(instance) for name, read in fields}
+
+
+def compile_list(field):
+    child = compile_fields(field.child)
+    get = get_accessor(field.source)
+
+    def read(instance):
+        value = get(instance)
+        if value is None:
+            return None
+        if isinstance(value, models.Manager):
+            value = value.all()
+        return [serialize(child, item) for item in value]
+    return read
+
+
+def compile_nested(field):
+    fields = compile_fields(field)
+    get = get_accessor(field.source)
+
+    def read(instance):
+        value = get(instance)
+        return None if value is None else serialize(fields, value)
+    return read
+
+
+def compile_primary_key(field):
+    *path, name = field.source_attrs
+
+    def read(instance):
+        value = get_attribute(instance, path)
+        return None if value is None else value.serializable_value(name)
+    return read
+
+
+def compile_generic(field):
+    def read(instance):
+        value = field.get_attribute(instance)
+        return None if value is None else field.to_representation(value)
+    return read
+
+
+def compile_field(field):
+    if field.source != '*':
+        if (isinstance(field, serializers.ListSerializer)
+                and type(field) is serializers.ListSerializer
+                and is_plain(field.child)):
+            return compile_list(field)
+        if isinstance(field, serializers.Serializer) and is_plain(field):
+            return compile_nested(field)
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(field.parent, field.method_name)
+    if field.source == '*' or isinstance(field, serializers.BaseSerializer):
+        return compile_generic(field)
+    if (isinstance(field, serializers.PrimaryKeyRelatedField)
+            and field.pk_field is None):
+        return compile_primary_key(field)
+    if isinstance(field, serializers.RelatedField):
+        return compile_generic(field)
+    convert = get_converter(field)
+    if convert is None:
+        return get_accessor(field.source)
+    get = get_accessor(field.source)
+
+    def read(instance):
+        value = get(instance)
+        return None if value is None else convert(value)
+    return read
+
+
+class Plans(threading.local):
+    """Планы сериализаторов текущего потока: {класс: (корень, поля)}."""
+
+    def __init__(self):
+        self.by_class = {}
+
+
+plans = Plans()
+
+
+def get_plan(serializer_class):
+    if serializer_class not in plans.by_class:
+        root = serializer_class()
+        plans.by_class[serializer_class] = root, compile_fields(root)
+    return plans.by_class[serializer_class]
+
+
+class CompiledSerializer:
+    """Заменяет serializer_class на чтение: CompiledSerializer(instance,
+    many=..., context=...).data совпадает с данными serializer_class."""
+    serializer_class = None
+
+    def __init__(self, instance=None, many=False, context=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+
+    @property
+    def data(self):
+        root, fields = get_plan(self.serializer_class)
+        root._context = self.context
+        try:
+            if self.many:
+                return [serialize(fields, item) for item in self.instance]
+            return serialize(fields, self.instance)
+        finally:
+            root._context = {}
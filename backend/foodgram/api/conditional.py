@@ -0,0 +1,102 @@
+"""Условные GET-запросы (If-None-Match / If-Modified-Since).
+
+Валидаторы ответа строятся до выборки и сериализации данных: из
+поколений в кэше (api.generations), от которых зависит ответ, и, если
+вьюсет их даёт, дешёвых полей из БД вроде Recipe.updated_at. Для
+авторизованного пользователя к ним добавляется поколение его
+избранного, корзины и подписок, поэтому is_favorited и подобные поля
+не отдаются клиенту устаревшими.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import generations
+from .response_cache import get_request_parts
+
+
+def make_validators(request, scopes, user_id=None, values=()):
+    """ETag и Last-Modified ответа по поколениям scopes, поколению
+    пользователя user_id и дополнительным значениям values из БД."""
+    scopes = list(scopes)
+    if user_id is not None:
+        scopes.append(generations.viewer(user_id))
+    found = generations.get_many(scopes)
+    parts = get_request_parts(request)
+    parts.append(str(user_id))
+    parts.extend(f'{name}={value}' for name, value in sorted(found.items()))
+    parts.extend(map(str, values))
+    timestamps = [generations.to_timestamp(value) for value in found.values()]
+    timestamps.extend(int(value.timestamp()) for value in values
+                      if hasattr(value, 'timestamp'))
+    return (hashlib.sha1('\n'.join(parts).encode()).hexdigest(),
+            max(timestamps, default=None))
+
+
+class PreconditionError(Exception):
+    """Прерывает обработку запроса готовым ответом 304 или 412."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на GET и HEAD, если валидаторы клиента актуальны.
+
+    Вьюсет перечисляет в get_validator_scopes() поколения, от которых
+    зависит ответ текущего действия, и может вернуть из
+    get_validator_values() значения из БД (None, если объекта нет).
+    Для авторизованного пользователя добавляется поколение
+    generations.viewer().
+    """
+    validator_scopes = ()
+    validators = None
+
+    def get_validator_scopes(self):
+        return self.validator_scopes
+
+    def get_validator_values(self):
+        return ()
+
+    def get_validators(self):
+        """Возвращает (etag, last_modified) или None."""
+        values = self.get_validator_values()
+        if values is None:
+            return None
+        user = self.request.user
+        return make_validators(
+            self.request, self.get_validator_scopes(),
+            user.pk if user.is_authenticated else None, values)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method not in ('GET', 'HEAD'):
+            return
+        self.validators = self.get_validators()
+        if self.validators is None:
+            return
+        etag, last_modified = self.validators
+        response = get_conditional_response(
+            request, etag=quote_etag(etag), last_modified=last_modified)
+        if response is not None:
+            raise PreconditionError(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, PreconditionError):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if self.validators is None or response.status_code not in (200, 304):
+            return response
+        etag, last_modified = self.validators
+        response['ETag'] = quote_etag(etag)
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        return response
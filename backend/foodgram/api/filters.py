@@ -1,7 +1,9 @@
-from django.db.models import BooleanField, ExpressionWrapper, Q
 from django_filters.rest_framework import FilterSet, filters
+from recipes import search
 from recipes.models import Ingredient, Recipe
 
+from .search import search_ingredients
+
 
 class IngredientFilter(FilterSet):
     """Фильтр ингредиентов по названию"""
@@ -13,26 +15,22 @@ class IngredientFilter(FilterSet):
 
     def filter_name(self, queryset, name, value):
         """Метод возвращает кверисет с заданным именем ингредиента."""
-        return queryset.filter(
-            Q(name__istartswith=value) | Q(name__icontains=value)
-        ).annotate(
-            startswith=ExpressionWrapper(
-                Q(name__istartswith=value),
-                output_field=BooleanField()
-            )
-        ).order_by('-startswith')
+        return search_ingredients(queryset, value)
 
 
 class RecipeFilter(FilterSet):
-    """Фильтр рецептов по автору/тегу/подписке/наличию в списке покупок"""
+    """Фильтр рецептов по автору/тегу/подписке/наличию в списке покупок
+    и полнотекстовый поиск по названию, ингредиентам и тексту"""
     tags = filters.AllValuesMultipleFilter(field_name='tags__slug')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart',
+                  'search')
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -43,3 +41,7 @@ class RecipeFilter(FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        """Найденные рецепты, самые релевантные первыми."""
+        return search.search(queryset, value)
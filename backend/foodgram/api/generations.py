@@ -0,0 +1,69 @@
+"""Счётчики поколений в общем кэше.
+
+Закэшированные данные запоминают поколения того, из чего они собраны,
+и считаются устаревшими, как только хотя бы одно поколение изменилось.
+Сигналы моделей только сдвигают счётчик и не обращаются к БД, причём
+после фиксации транзакции (bump_on_commit): иначе параллельный запрос
+прочитал бы новое поколение, но старые строки, и закэшировал бы старый
+ответ под новым ключом.
+Значение поколения — время последнего изменения в наносекундах (не
+меньше предыдущего значения плюс один), поэтому по нему же строится
+заголовок Last-Modified. Отсутствующий счётчик заводится со значением от
+текущего времени, чтобы после очистки кэша он не совпал ни с одним ранее
+выданным.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+KEY = 'generation:{}'
+
+
+def get_key(name):
+    return KEY.format(name)
+
+
+def get(name):
+    return cache.get_or_set(get_key(name), time.time_ns, timeout=None)
+
+
+def get_many(names):
+    """Возвращает словарь {имя: поколение} одним обращением к кэшу."""
+    found = cache.get_many([get_key(name) for name in names])
+    return {
+        name: found.get(get_key(name)) or get(name) for name in names}
+
+
+def bump(*names):
+    current = cache.get_many([get_key(name) for name in names])
+    now = time.time_ns()
+    cache.set_many({
+        key: max(now, current.get(key, 0) + 1)
+        for key in map(get_key, names)}, timeout=None)
+
+
+def bump_on_commit(*names):
+    """bump после фиксации текущей транзакции или сразу, если её нет."""
+    transaction.on_commit(lambda: bump(*names))
+
+
+def to_timestamp(generation):
+    """Переводит поколение в секунды для заголовка Last-Modified."""
+    return generation // 10 ** 9
+
+
+def recipe(recipe_id):
+    return f'recipe:{recipe_id}'
+
+
+def viewer(user_id):
+    """Поколение состояния пользователя: избранное, корзина, подписки."""
+    return f'viewer:{user_id}'
+
+
+RECIPES = 'recipes'
+INGREDIENTS = 'ingredients'
+TAGS = 'tags'
+# Поля авторов, встроенные в ответы с рецептами.
+USERS = 'users'
@@ -0,0 +1,88 @@
+import statistics
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+
+from django.core.management.base import BaseCommand
+
+DEFAULT_PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=20',
+    '/api/tags/',
+    '/api/ingredients/?name=со',
+)
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест запущенного сервера: N запросов к каждому '
+            'адресу с заданной параллельностью. Позволяет сравнить режимы '
+            'SERVER_MODE=wsgi и SERVER_MODE=asgi.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+        parser.add_argument('--base-url', default='http://localhost:8000')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--token', help='Токен для запросов с '
+                                            'авторизацией.')
+        parser.add_argument('--timeout', type=float, default=30)
+
+    def handle(self, paths, base_url, requests, concurrency, warmup, token,
+               timeout, **options):
+        headers = {'Accept': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Token {token}'
+        for path in paths:
+            url = base_url.rstrip('/') + quote(path, safe='/?=&')
+            for _ in range(warmup):
+                self.fetch(url, headers, timeout)
+            self.report(path, *self.run(
+                url, headers, requests, concurrency, timeout))
+
+    @staticmethod
+    def fetch(url, headers, timeout):
+        started = time.perf_counter()
+        try:
+            with urlopen(Request(url, headers=headers),
+                         timeout=timeout) as response:
+                response.read()
+                status = response.status
+        except HTTPError as error:
+            status = error.code
+        except (URLError, OSError) as error:
+            status = type(error).__name__
+        return time.perf_counter() - started, status
+
+    def run(self, url, headers, requests, concurrency, timeout):
+        lock = threading.Lock()
+        latencies = []
+        statuses = Counter()
+
+        def worker(_):
+            latency, status = self.fetch(url, headers, timeout)
+            with lock:
+                latencies.append(latency)
+                statuses[status] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            list(executor.map(worker, range(requests)))
+        return time.perf_counter() - started, sorted(latencies), statuses
+
+    def report(self, path, elapsed, latencies, statuses):
+        self.stdout.write(
+            f'{path}: {len(latencies) / elapsed:.1f} запр./с, '
+            f'среднее {statistics.mean(latencies) * 1000:.1f} мс, '
+            f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, '
+            f'p95 {percentile(latencies, 0.95) * 1000:.1f} мс, '
+            f'p99 {percentile(latencies, 0.99) * 1000:.1f} мс, '
+            f'ответы {dict(statuses)}')
@@ -0,0 +1,155 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       PageNumberPagination)
+
+
+class LimitPageNumberPagination(PageNumberPagination):
+    """Постраничная пагинация с размером страницы из параметра limit."""
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Курсорная пагинация по всем полям ordering.
+
+    CursorPagination из DRF кладёт в курсор только первое поле сортировки
+    и внутри группы строк с одинаковым значением листает через OFFSET.
+    Здесь позиция — значения всех полей (последнее должно быть
+    уникальным), поэтому позиции строк не повторяются, смещение в
+    курсорах всегда нулевое, а страница выбирается условием по кортежу.
+    """
+    position_separator = '|'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            offset, reverse, current_position = 0, False, None
+        else:
+            offset, reverse, current_position = self.cursor
+        ordering = self.ordering
+        if reverse:
+            ordering = [order[1:] if order.startswith('-') else f'-{order}'
+                        for order in ordering]
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            queryset = queryset.filter(self.get_position_filter(
+                queryset.model, current_position, reverse))
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = None
+        if len(results) > len(self.page):
+            following_position = self._get_position_from_instance(
+                results[-1], self.ordering)
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = (
+                has_current, following_position is not None)
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next, self.has_previous = (
+                following_position is not None, has_current)
+            self.next_position = following_position
+            self.previous_position = current_position
+        if ((self.has_previous or self.has_next)
+                and self.template is not None):
+            self.display_page_controls = True
+        return self.page
+
+    def get_position_filter(self, model, position, reverse):
+        """Условие «строка идёт после позиции» по кортежу полей: (a, b)
+        после (x, y), если a после x или a = x и b после y. Лишнее
+        условие на первое поле позволяет СУБД начать с диапазона
+        индекса."""
+        values = position.split(self.position_separator)
+        if len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        bounds = []
+        for order, value in zip(self.ordering, values):
+            name = order.lstrip('-')
+            try:
+                value = model._meta.get_field(name).to_python(value)
+            except ValidationError:
+                raise NotFound(self.invalid_cursor_message)
+            lookup = 'lt' if order.startswith('-') != reverse else 'gt'
+            bounds.append((name, lookup, value))
+        condition = None
+        for name, lookup, value in reversed(bounds):
+            after = Q(**{f'{name}__{lookup}': value})
+            condition = after if condition is None else (
+                after | Q(**{name: value}) & condition)
+        name, lookup, value = bounds[0]
+        return Q(**{f'{name}__{lookup}e': value}) & condition
+
+    def _get_position_from_instance(self, instance, ordering):
+        get_position = super()._get_position_from_instance
+        return self.position_separator.join(
+            get_position(instance, (order,)) for order in ordering)
+
+
+class RecipeCursorPagination(KeysetCursorPagination):
+    """Курсорная пагинация рецептов по индексу (pub_date, id): стоимость
+    страницы не зависит от её глубины и не требует COUNT(*)."""
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    """Курсорная пагинация подписок, новые подписки идут первыми."""
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+    ordering = '-subscription_id'
+
+
+class FeedPagination(BasePagination):
+    """Постраничная пагинация по умолчанию, курсорная по запросу.
+
+    Клиент включает курсорный режим параметром ?pagination=cursor;
+    ссылки next/previous сохраняют его.
+    """
+    mode_query_param = 'pagination'
+    page_number_class = LimitPageNumberPagination
+    cursor_class = None
+
+    def get_paginator(self, request):
+        if (request.query_params.get(self.mode_query_param) == 'cursor'
+                or self.cursor_class.cursor_query_param
+                in request.query_params):
+            return self.cursor_class()
+        return self.page_number_class()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.paginator = self.get_paginator(request)
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(
+            schema)
+
+    def get_schema_fields(self, view):
+        return self.page_number_class().get_schema_fields(view)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number_class().get_schema_operation_parameters(
+            view)
+
+
+class RecipeFeedPagination(FeedPagination):
+    cursor_class = RecipeCursorPagination
+
+
+class SubscriptionFeedPagination(FeedPagination):
+    cursor_class = SubscriptionCursorPagination
@@ -0,0 +1,145 @@
+"""Кэш ответов на безопасные запросы анонимных пользователей.
+
+Два уровня: LRU в памяти процесса перед общим кэшем Django. Ключ
+строится из схемы, хоста и пути, отсортированных параметров запроса,
+заголовка Accept и поколений данных, от которых зависит ответ
+(api.generations). Сигналы моделей увеличивают только нужные поколения,
+поэтому правка рецепта сбрасывает его карточку и ленты, но не ответы
+по тегам и ингредиентам. Устаревшие записи никто не удаляет: на них
+просто перестают ссылаться ключи, и они вытесняются по LRU и таймауту.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from . import generations
+
+KEY = 'response:{}'
+CACHED_HEADERS = ('Allow', 'Vary', 'ETag', 'Last-Modified')
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.data:
+                return None
+            self.data.move_to_end(key)
+            return self.data[key]
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+local_cache = LRUCache(settings.RESPONSE_CACHE_LRU_SIZE)
+
+
+def is_cacheable(request):
+    return (request.method in ('GET', 'HEAD')
+            and 'HTTP_AUTHORIZATION' not in request.META)
+
+
+def get_request_parts(request):
+    """Схема, хост, путь, отсортированные параметры и Accept: всё, что в
+    запросе влияет на тело ответа. Схема и хост входят в абсолютные
+    ссылки next, previous и адреса картинок."""
+    query = sorted(
+        (name, value) for name, values in request.GET.lists()
+        for value in values)
+    return [request.scheme, request.get_host(), request.path, repr(query),
+            request.META.get('HTTP_ACCEPT', '')]
+
+
+def make_key(request, scopes):
+    parts = get_request_parts(request)
+    parts.extend(
+        f'{name}={value}'
+        for name, value in sorted(generations.get_many(scopes).items()))
+    return KEY.format(
+        hashlib.sha1('\n'.join(parts).encode()).hexdigest())
+
+
+def get(key):
+    value = local_cache.get(key)
+    if value is None:
+        value = cache.get(key)
+        if value is not None:
+            local_cache.set(key, value)
+    if value is None:
+        return None
+    status, content, content_type, headers = value
+    response = HttpResponse(content, status=status, content_type=content_type)
+    for header, header_value in headers.items():
+        response[header] = header_value
+    return response
+
+
+def store(key, response):
+    value = (
+        response.status_code,
+        response.content,
+        response['Content-Type'],
+        {header: response[header]
+         for header in CACHED_HEADERS if response.has_header(header)},
+    )
+    local_cache.set(key, value)
+    cache.set(key, value, settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def conditional(request, response):
+    """Отвечает 304 на закэшированный ответ, если валидаторы совпали."""
+    return get_conditional_response(
+        request, etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified')),
+        response=response)
+
+
+class ResponseCacheMixin:
+    """Отдаёт анонимным пользователям ответы из кэша в обход DRF.
+
+    Вьюсет перечисляет в get_cache_scopes() поколения, от которых зависит
+    ответ текущего действия.
+    """
+    cache_scopes = ()
+
+    def get_cache_scopes(self):
+        return self.cache_scopes
+
+    def dispatch(self, request, *args, **kwargs):
+        if not is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        self.kwargs = kwargs
+        key = make_key(request, self.get_cache_scopes())
+        response = get(key)
+        if response is not None:
+            return conditional(request, response)
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            if hasattr(response, 'render'):
+                response.render()
+            store(key, response)
+        return response
@@ -0,0 +1,135 @@
+"""Поиск ингредиентов по названию.
+
+На PostgreSQL запрос строится по lower(name) и использует GIN-индекс
+pg_trgm для поиска по подстроке и индекс text_pattern_ops для поиска по
+префиксу (см. миграцию recipes 0004). На остальных СУБД (SQLite в
+тестах и локальной разработке) поиск идёт по снимку справочника в памяти
+процесса, тому же, из которого IngredientViewSet отдаёт ответы.
+В обоих случаях сначала идут названия, начинающиеся с запроса.
+"""
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+
+from django.db import connections
+from django.db.models import (BooleanField, Case, ExpressionWrapper, Q, Value,
+                              When)
+from django.db.models.functions import Lower
+from recipes.models import Ingredient
+
+from . import generations
+
+NGRAM_SIZE = 3
+ORDERING = ('-startswith', 'name')
+
+
+def get_ngrams(value):
+    return {value[i:i + NGRAM_SIZE]
+            for i in range(len(value) - NGRAM_SIZE + 1)}
+
+
+class IngredientSnapshot:
+    """Неизменяемый снимок справочника ингредиентов в памяти процесса.
+
+    Хранит строки (id, name, measurement_unit) с готовыми JSON-фрагментами,
+    отсортированный массив названий в нижнем регистре для поиска по
+    префиксу и словарь n-грамм для поиска по подстроке.
+    """
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.ids = tuple(pk for pk, _, _ in rows)
+        self.fragments = {
+            pk: json.dumps(
+                {'id': pk, 'name': name, 'measurement_unit': unit},
+                ensure_ascii=False, separators=(',', ':')).encode()
+            for pk, name, unit in rows
+        }
+        self.keys = tuple(sorted((name.lower(), pk) for pk, name, _ in rows))
+        self.names = tuple(key for key, _ in self.keys)
+        ngrams = defaultdict(set)
+        for key, pk in self.keys:
+            for ngram in get_ngrams(key):
+                ngrams[ngram].add(pk)
+        self.ngrams = {
+            ngram: frozenset(ids) for ngram, ids in ngrams.items()}
+
+    @classmethod
+    def from_db(cls, version=None):
+        return cls(Ingredient.objects.order_by('pk').values_list(
+            'pk', 'name', 'measurement_unit'), version)
+
+    def startswith(self, value):
+        position = bisect_left(self.names, value)
+        result = []
+        while (position < len(self.keys)
+               and self.names[position].startswith(value)):
+            result.append(self.keys[position][1])
+            position += 1
+        return result
+
+    def contains(self, value):
+        if len(value) < NGRAM_SIZE:
+            return [pk for key, pk in self.keys if value in key]
+        candidates = frozenset.intersection(
+            *(self.ngrams.get(ngram, frozenset())
+              for ngram in get_ngrams(value)))
+        return [pk for key, pk in self.keys
+                if pk in candidates and value in key]
+
+    def search(self, value):
+        """Возвращает (id по префиксу, id по подстроке)."""
+        value = value.lower()
+        return self.startswith(value), self.contains(value)
+
+    def ranked(self, value):
+        """id найденных ингредиентов: сначала совпадения по префиксу."""
+        prefix, matches = self.search(value)
+        found = set(prefix)
+        return prefix + [pk for pk in matches if pk not in found]
+
+    def render(self, ids):
+        return b'[' + b','.join(self.fragments[pk] for pk in ids) + b']'
+
+
+@lru_cache(maxsize=1)
+def load_snapshot(version):
+    return IngredientSnapshot.from_db(version)
+
+
+def get_snapshot():
+    """Возвращает снимок справочника, перечитывая его из БД только после
+    изменения счётчика версий."""
+    return load_snapshot(generations.get(generations.INGREDIENTS))
+
+
+def search_postgresql(queryset, value):
+    value = value.lower()
+    return queryset.annotate(
+        name_lower=Lower('name')
+    ).filter(
+        name_lower__contains=value
+    ).annotate(
+        startswith=ExpressionWrapper(
+            Q(name_lower__startswith=value),
+            output_field=BooleanField()
+        )
+    ).order_by(*ORDERING)
+
+
+def search_in_memory(queryset, value):
+    prefix, matches = get_snapshot().search(value)
+    return queryset.filter(pk__in=matches).annotate(
+        startswith=Case(
+            When(pk__in=prefix, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    ).order_by(*ORDERING)
+
+
+def search_ingredients(queryset, value):
+    if connections[queryset.db].vendor == 'postgresql':
+        return search_postgresql(queryset, value)
+    return search_in_memory(queryset, value)
@@ -1,16 +1,22 @@
-import base64
-
 from api.backends import EmailBackend
-from django.core.files.base import ContentFile
+from django.conf import settings
 from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.urls import reverse
 from djoser.serializers import UserCreateSerializer, UserSerializer
+from jobs.models import Job
+from recipes import images, search
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+                            RecipeQuerySet, ShoppingCart, Tag)
+from recipes.tasks import schedule_renditions
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
 from rest_framework.pagination import PageNumberPagination
 from users.models import Subscription, User
 
+from . import toggles
+from .viewer_state import get_viewer_state
+
 
 class UsersCreateSerializer(UserCreateSerializer):
     """Сериализатор для создания пользователя."""
@@ -33,30 +39,67 @@ class UsersSerializer(UserSerializer):
                   'is_subscribed']
 
     def get_is_subscribed(self, object):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return object.id in self.context.get('subscriptions')
+        return get_viewer_state(self.context).is_subscribed(object.id)
+
+
+class ImageRenditionField(serializers.ImageField):
+    """URL уменьшенной копии изображения рецепта.
+
+    Пока копия не построена (например, у рецептов, загруженных до
+    появления копий), отдаёт URL оригинала.
+    """
+
+    def __init__(self, rendition, **kwargs):
+        self.rendition = rendition
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        return super().to_representation(
+            getattr(recipe, f'image_{self.rendition}') or recipe.image)
 
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Сериализатор для краткой информации о рецепте"""
+    image_thumbnail = ImageRenditionField('thumbnail')
 
     class Meta:
         model = Recipe
         fields = [
-            'id', 'name', 'image', 'cooking_time']
+            'id', 'name', 'image', 'image_thumbnail', 'cooking_time']
+
+
+def get_recipes_limit(request):
+    """Число рецептов автора в ленте подписок из параметра recipes_limit."""
+    limit = request.query_params.get('recipes_limit')
+    if limit is not None and limit.isdigit() and int(limit) > 0:
+        return int(limit)
+    return None
 
 
 class UserWithRecipes(UsersSerializer):
-    """Сериализатор для работы с подписками."""
-    recipes = RecipeMinifiedSerializer(many=True)
+    """Сериализатор для работы с подписками.
+
+    Если рецепты авторов заранее загружены в recipe_previews (см.
+    UserSubscriptionViewSet.subscriptions), берёт их оттуда.
+    """
+    recipes = SerializerMethodField(read_only=True)
 
     class Meta(UsersSerializer.Meta):
         fields = ['email', 'id', 'username', 'first_name', 'last_name',
                   'recipes', 'recipes_count']
         pagination_class = PageNumberPagination
 
+    def get_recipes(self, author):
+        recipes = getattr(author, 'recipe_previews', None)
+        if recipes is None:
+            recipes = author.recipes.all()
+            limit = get_recipes_limit(self.context.get('request'))
+            if limit:
+                recipes = recipes[:limit]
+        return RecipeMinifiedSerializer(
+            recipes, many=True, context=self.context).data
+
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с тегами."""
@@ -98,15 +141,21 @@ class AddIngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
-    """Кастомное поле для кодирования изображения в base64."""
+    """Кастомное поле для кодирования изображения в base64.
 
-    def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='photo.' + ext)
+    Изображение проходит через recipes.images.process: проверку и
+    перекодирование без EXIF. Уменьшенные копии строятся в фоне.
+    """
 
-        return super().to_internal_value(data)
+    def to_internal_value(self, data):
+        try:
+            if isinstance(data, str) and data.startswith('data:image'):
+                return images.process(images.decode_data_uri(data))
+            data = super().to_internal_value(data)
+            images.check_size(data.size)
+            return images.process(data.read())
+        except images.ImageError as error:
+            raise serializers.ValidationError(str(error))
 
 
 class RecipeSerializer(serializers.ModelSerializer):
@@ -125,46 +174,89 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id', 'tags', 'author', 'ingredients',
             'name', 'image', 'text', 'cooking_time']
 
+    def validate_ingredients(self, ingredients):
+        """Проверяет ингредиенты одним запросом к БД."""
+        ids = [item['id'] for item in ingredients]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты в рецепте не должны повторяться.')
+        found = Ingredient.objects.in_bulk(ids)
+        unknown = [pk for pk in ids if pk not in found]
+        if unknown:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                f'{", ".join(map(str, unknown))}.')
+        for item in ingredients:
+            item['ingredient'] = found[item['id']]
+        return ingredients
+
+    @staticmethod
+    def save_ingredients(recipe, ingredients):
+        """Приводит строки RecipeIngredient рецепта к переданному списку,
+        меняя только то, что отличается."""
+        current = {row.ingredient_id: row
+                   for row in recipe.recipe_ingredient.all()}
+        to_create = []
+        to_update = []
+        for item in ingredients:
+            amount = item.get('amount', 1)
+            row = current.pop(item['id'], None)
+            if row is None:
+                to_create.append(RecipeIngredient(
+                    recipe=recipe, ingredient=item['ingredient'],
+                    amount=amount))
+            elif row.amount != amount:
+                row.amount = amount
+                to_update.append(row)
+        if current:
+            RecipeIngredient.objects.filter(
+                pk__in=[row.pk for row in current.values()]).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+
     @transaction.atomic()
     def create(self, validated_data):
         user = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(author=user,
-                                       **validated_data)
+        image = validated_data.pop('image')
+        recipe = Recipe(author=user, **validated_data)
+        images.attach(recipe, image)
+        recipe.save()
+        schedule_renditions(recipe)
         recipe.tags.set(tags)
         RecipeIngredient.objects.bulk_create(
             [RecipeIngredient(
                 recipe=recipe,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
-                amount=ingredient.get('amount')
+                ingredient=ingredient['ingredient'],
+                amount=ingredient.get('amount', 1)
             ) for ingredient in ingredients])
-
+        search.update_documents([recipe.pk])
         return recipe
 
     @transaction.atomic()
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
+        if 'image' in validated_data:
+            images.attach(instance, validated_data['image'])
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time)
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        RecipeIngredient.objects.filter(
-            recipe=instance,
-            ingredient__in=instance.ingredients.all()).delete()
         instance.tags.set(tags)
-        RecipeIngredient.objects.bulk_create(
-            [RecipeIngredient(
-                recipe=instance,
-                ingredient=Ingredient.objects.get(pk=ingredient['id']),
-                amount=ingredient.get('amount')
-            ) for ingredient in ingredients])
+        self.save_ingredients(instance, ingredients)
         instance.save()
+        search.update_documents([instance.pk])
+        if 'image' in validated_data:
+            schedule_renditions(instance)
         return instance
 
     def to_representation(self, instance):
+        prefetch_related_objects(
+            [instance], *RecipeQuerySet.prefetch_lookups())
         return GetRecipeSerializer(instance, context=self.context).data
 
 
@@ -176,24 +268,21 @@ class GetRecipeSerializer(serializers.ModelSerializer):
                                              source='recipe_ingredient')
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    image_card = ImageRenditionField('card')
+    image_thumbnail = ImageRenditionField('thumbnail')
 
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_card', 'image_thumbnail',
+                  'text', 'cooking_time')
 
     def get_is_favorited(self, object):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return object.id in self.context.get('favorites')
+        return get_viewer_state(self.context).is_favorited(object.id)
 
     def get_is_in_shopping_cart(self, object):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return object.id in self.context.get('shopping')
+        return get_viewer_state(self.context).is_in_shopping_cart(object.id)
 
 
 class SubscriptionSerializer(serializers.ModelSerializer):
@@ -204,37 +293,6 @@ class SubscriptionSerializer(serializers.ModelSerializer):
         model = Subscription
         fields = ['author']
 
-    def validate(self, attrs):
-        author = self.initial_data.get('author')
-        user = self.context.get('request').user
-        method = self.context.get('request').method
-        subscription = self.initial_data.get('subscription')
-        if user == author:
-            raise serializers.ValidationError(
-                'Нельзя подписаться или отписаться от себя!')
-        if method == 'POST':
-            if subscription.exists():
-                raise serializers.ValidationError(
-                    'Вы уже подписаны на этого автора')
-            attrs['author'] = author
-            return attrs
-        if method == 'DELETE':
-            if not subscription.exists():
-                raise serializers.ValidationError(
-                    'Вы не подписаны на этого пользователя')
-            attrs['author'] = author
-            return attrs
-        return attrs
-
-    @transaction.atomic()
-    def create(self, validated_data):
-        user = self.context['request'].user
-        author = validated_data['author']
-        return Subscription.objects.create(user=user, author=author)
-
-    def delete(self, instance):
-        instance.delete()
-
     def to_representation(self, instance):
         return UserWithRecipes(instance.author, context=self.context).data
 
@@ -278,69 +336,43 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ['recipe']
 
-    def validate(self, attrs):
-        recipe = self.initial_data.get('recipe')
-        method = self.context.get('request').method
-        favorites = self.initial_data.get('favorites')
-        if method == 'POST':
-            if favorites.exists():
-                raise serializers.ValidationError(
-                    'Рецепт уже добавлен в избранное!')
-            attrs['recipe'] = recipe
-            return attrs
-        elif method == 'DELETE':
-            if not favorites.exists():
-                raise serializers.ValidationError(
-                    'Рецепта нет в избранном!')
-            attrs['recipe'] = recipe
-            return attrs
-        return attrs
-
-    @transaction.atomic()
-    def create(self, validated_data):
-        user = self.context['request'].user
-        recipe = validated_data['recipe']
-        return Favorite.objects.create(user=user, recipe=recipe)
-
-    def delete(self, instance):
-        return instance.delete()
-
 
 class ShoppingCartSerializer(FavoriteSerializer):
-    """Сериализатор для работы с избранными рецептами."""
-    recipe = RecipeMinifiedSerializer(read_only=True)
+    """Сериализатор для работы со списком покупок."""
 
     class Meta:
-        model = Favorite
+        model = ShoppingCart
         fields = ['recipe']
 
-    def validate(self, attrs):
-        recipe = self.initial_data.get('recipe')
-        method = self.context.get('request').method
-        shopping = self.initial_data.get('shopping')
-        if method == 'POST':
-            if shopping.exists():
-                raise serializers.ValidationError(
-                    'Рецепт уже добавлен в список покупок!')
-            attrs['recipe'] = recipe
-            return attrs
-        if method == 'DELETE':
-            if not shopping.exists():
-                raise serializers.ValidationError(
-                    'Рецепта нет в списке покупок!')
-            attrs['recipe'] = recipe
-            return attrs
-        return attrs
-
-    @transaction.atomic()
-    def create(self, validated_data):
-        user = self.context['request'].user
-        recipe = validated_data['recipe']
-        return ShoppingCart.objects.create(user=user, recipe=recipe)
-
-    def delete(self, instance):
-        instance.delete()
-
     def to_representation(self, instance):
         return RecipeMinifiedSerializer(instance.recipe,
                                         context=self.context).data
+
+
+class BatchOperationSerializer(serializers.Serializer):
+    """Операция пакета: добавить или убрать связь с объектом id."""
+    action = serializers.ChoiceField(choices=[toggles.ADD, toggles.REMOVE])
+    id = serializers.IntegerField(min_value=1)
+
+
+class BatchSerializer(serializers.Serializer):
+    """Пакет операций со связями пользователя."""
+    operations = BatchOperationSerializer(
+        many=True, allow_empty=False,
+        max_length=settings.TOGGLE_BATCH_MAX_SIZE)
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """Сериализатор для статуса фоновой задачи."""
+    download_url = serializers.SerializerMethodField(read_only=True)
+
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'status', 'created_at', 'finished_at',
+                  'download_url')
+
+    def get_download_url(self, job):
+        if job.status != Job.DONE or not job.result:
+            return None
+        return self.context['request'].build_absolute_uri(
+            reverse('api:jobs-download', args=[job.pk]))
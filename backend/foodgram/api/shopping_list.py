@@ -0,0 +1,222 @@
+"""Формирование списка покупок в форматах PDF, TXT и CSV."""
+import csv
+import hashlib
+import io
+import os
+from itertools import chain
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils.http import quote_etag
+from recipes.models import RecipeIngredient, ShoppingCart
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfgen import canvas
+from rest_framework.renderers import JSONRenderer
+
+from . import generations
+
+FONT_NAME = 'Arial'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'data', 'arial.ttf')
+TITLE = 'Список покупок'
+LINE_TEMPLATE = '{number}. {name} ({measurement_unit}) - {amount}'
+CSV_HEADER = ('name', 'measurement_unit', 'amount')
+CHUNK_SIZE = 64 * 1024
+CACHE_KEY = 'shopping_list:{user_id}:{format}'
+
+
+def register_fonts():
+    """Регистрирует шрифты ReportLab один раз на процесс."""
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(ttfonts.TTFont(FONT_NAME, FONT_PATH))
+
+
+def get_shopping_list(user):
+    """Суммирует ингредиенты рецептов из списка покупок на стороне БД."""
+    return RecipeIngredient.objects.filter(
+        recipe__shopping_cart__user=user
+    ).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit')
+    ).annotate(
+        total=Sum('amount')
+    ).order_by('name')
+
+
+def format_line(number, item):
+    return LINE_TEMPLATE.format(number=number, name=item['name'],
+                                measurement_unit=item['measurement_unit'],
+                                amount=item['total'])
+
+
+class ShoppingListRenderer:
+    """Базовый рендерер: возвращает документ как итератор байтовых чанков."""
+    format = None
+    media_type = None
+    extension = None
+
+    @property
+    def filename(self):
+        return f'shopping_cart.{self.extension}'
+
+    def render(self, items):
+        raise NotImplementedError
+
+
+class PDFShoppingListRenderer(ShoppingListRenderer):
+    format = 'pdf'
+    media_type = 'application/pdf'
+    extension = 'pdf'
+    font_size = 14
+    top = 750
+    first_line = 700
+    bottom_margin = 50
+    line_height = 25
+    spool_max_size = 1024 * 1024
+
+    def render(self, items):
+        buffer = SpooledTemporaryFile(max_size=self.spool_max_size)
+        p = canvas.Canvas(buffer)
+        p.setFont(FONT_NAME, self.font_size)
+        p.drawString(100, self.top, TITLE)
+        height = self.first_line
+        for number, item in enumerate(items, start=1):
+            if height < self.bottom_margin:
+                p.showPage()
+                p.setFont(FONT_NAME, self.font_size)
+                height = self.top
+            p.drawString(80, height, format_line(number, item))
+            height -= self.line_height
+        p.showPage()
+        p.save()
+        buffer.seek(0)
+        return iter(lambda: buffer.read(CHUNK_SIZE), b'')
+
+
+class TextShoppingListRenderer(ShoppingListRenderer):
+    format = 'txt'
+    media_type = 'text/plain; charset=utf-8'
+    extension = 'txt'
+
+    def render(self, items):
+        yield f'{TITLE}\n\n'.encode()
+        for number, item in enumerate(items, start=1):
+            yield f'{format_line(number, item)}\n'.encode()
+
+
+class CSVShoppingListRenderer(ShoppingListRenderer):
+    format = 'csv'
+    media_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+
+    def render(self, items):
+        line = io.StringIO()
+        writer = csv.writer(line)
+        for row in self.rows(items):
+            writer.writerow(row)
+            yield line.getvalue().encode()
+            line.seek(0)
+            line.truncate()
+
+    @staticmethod
+    def rows(items):
+        yield CSV_HEADER
+        for item in items:
+            yield item['name'], item['measurement_unit'], item['total']
+
+
+RENDERERS = {
+    renderer.format: renderer() for renderer in (
+        PDFShoppingListRenderer,
+        TextShoppingListRenderer,
+        CSVShoppingListRenderer,
+    )
+}
+DEFAULT_FORMAT = PDFShoppingListRenderer.format
+
+
+def get_renderer(format):
+    return RENDERERS.get(format, RENDERERS[DEFAULT_FORMAT])
+
+
+def get_digest(items):
+    """Хэш содержимого списка покупок, используется как ETag."""
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(
+            f"{item['name']}\x1f{item['measurement_unit']}\x1f"
+            f"{item['total']}\x1e".encode())
+    return digest.hexdigest()
+
+
+def get_cache_key(user_id, format):
+    return CACHE_KEY.format(user_id=user_id, format=format)
+
+
+def invalidate(user_ids):
+    """Сбрасывает закэшированные выгрузки пользователей."""
+    cache.delete_many([
+        get_cache_key(user_id, format)
+        for user_id in set(user_ids) for format in RENDERERS])
+
+
+def get_dependencies(user):
+    recipe_ids = ShoppingCart.objects.filter(
+        user=user).values_list('recipe_id', flat=True)
+    return [generations.INGREDIENTS] + [
+        generations.recipe(recipe_id) for recipe_id in recipe_ids]
+
+
+def export(user, renderer, etags=()):
+    """Возвращает (etag, чанки документа) для списка покупок пользователя.
+
+    Готовый документ хранится в кэше вместе с поколениями рецептов из
+    корзины и справочника ингредиентов; изменение корзины сбрасывает его
+    сразу. Если один из etags клиента совпал, документ не рендерится и
+    вместо чанков возвращается None. Документы больше
+    SHOPPING_LIST_CACHE_MAX_SIZE не кэшируются и отдаются потоком.
+    """
+    key = get_cache_key(user.id, renderer.format)
+    cached = cache.get(key)
+    if cached is not None:
+        cached_etag, content, dependencies = cached
+        if generations.get_many(dependencies) == dependencies:
+            if quote_etag(cached_etag) in etags:
+                return cached_etag, None
+            return cached_etag, iter((content,))
+    dependencies = generations.get_many(get_dependencies(user))
+    items = list(get_shopping_list(user))
+    digest = get_digest(items)
+    if quote_etag(digest) in etags:
+        return digest, None
+    chunks = renderer.render(items)
+    buffered, size = [], 0
+    for chunk in chunks:
+        buffered.append(chunk)
+        size += len(chunk)
+        if size > settings.SHOPPING_LIST_CACHE_MAX_SIZE:
+            return digest, chain(buffered, chunks)
+    content = b''.join(buffered)
+    cache.set(key, (digest, content, dependencies),
+              settings.SHOPPING_LIST_CACHE_TIMEOUT)
+    return digest, iter((content,))
+
+
+class PDFFormatRenderer(JSONRenderer):
+    """DRF сам разбирает параметр ?format= и отвечает 404 на незнакомые
+    значения. Эти классы только объявляют форматы выгрузки: файл
+    отдаётся в обход рендереров DRF, а ошибки по-прежнему в JSON."""
+    format = PDFShoppingListRenderer.format
+
+
+class TextFormatRenderer(JSONRenderer):
+    format = TextShoppingListRenderer.format
+
+
+class CSVFormatRenderer(JSONRenderer):
+    format = CSVShoppingListRenderer.format
+
+
+FORMAT_RENDERER_CLASSES = (
+    JSONRenderer, PDFFormatRenderer, TextFormatRenderer, CSVFormatRenderer)
@@ -0,0 +1,92 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from rest_framework.authtoken.models import Token
+from users.models import Subscription, User
+
+from . import authentication, generations, shopping_list
+
+# Поля пользователя, которые входят в ответы с рецептами (author).
+AUTHOR_FIELDS = ('email', 'username', 'first_name', 'last_name')
+
+
+def relations_changed(sender, user_ids):
+    """Сбрасывает кэши, зависящие от избранного, списка покупок или
+    подписок пользователей. Вызывается и там, где строки меняются без
+    сигналов (api.toggles). Кэши сбрасываются после фиксации транзакции,
+    чтобы параллельный запрос не закэшировал прежнее состояние заново."""
+    if sender is ShoppingCart:
+        user_ids = list(user_ids)
+        transaction.on_commit(lambda: shopping_list.invalidate(user_ids))
+    generations.bump_on_commit(
+        *(generations.viewer(user_id) for user_id in user_ids))
+
+
+@receiver([post_save, post_delete], sender=ShoppingCart)
+@receiver([post_save, post_delete], sender=Favorite)
+@receiver([post_save, post_delete], sender=Subscription)
+def viewer_state_changed(sender, instance, **kwargs):
+    relations_changed(sender, [instance.user_id])
+
+
+@receiver([post_save, post_delete], sender=RecipeIngredient)
+def recipe_ingredient_changed(sender, instance, **kwargs):
+    generations.bump_on_commit(
+        generations.recipe(instance.recipe_id), generations.RECIPES)
+
+
+@receiver([post_save, post_delete], sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    generations.bump_on_commit(
+        generations.recipe(instance.pk), generations.RECIPES)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, **kwargs):
+    if action.startswith('post_') and isinstance(instance, Recipe):
+        generations.bump_on_commit(
+            generations.recipe(instance.pk), generations.RECIPES)
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def tag_changed(sender, instance, **kwargs):
+    generations.bump_on_commit(generations.TAGS)
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Запоминает, меняет ли сохранение поля автора рецептов. Вход
+    (last_login) и пересчёт счётчиков их не трогают, новый пользователь
+    рецептов не имеет, а рецепты удалённого сбрасываются своими
+    сигналами."""
+    instance._author_changed = False
+    if raw or instance._state.adding or (
+            update_fields is not None
+            and not set(update_fields) & set(AUTHOR_FIELDS)):
+        return
+    old = User.objects.filter(pk=instance.pk).annotate(
+        has_recipes=Exists(Recipe.objects.filter(author=OuterRef('pk')))
+    ).values('has_recipes', *AUTHOR_FIELDS).first()
+    instance._author_changed = old is not None and old['has_recipes'] and any(
+        old[field] != getattr(instance, field) for field in AUTHOR_FIELDS)
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    if getattr(instance, '_author_changed', False):
+        generations.bump_on_commit(generations.USERS)
+    authentication.evict_user(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    authentication.evict([instance.key])
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, **kwargs):
+    generations.bump_on_commit(generations.INGREDIENTS)
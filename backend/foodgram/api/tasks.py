@@ -0,0 +1,15 @@
+from jobs.registry import Output, task
+from users.models import User
+
+from . import shopping_list
+
+SHOPPING_LIST_EXPORT = 'api.shopping_list_export'
+
+
+@task(SHOPPING_LIST_EXPORT)
+def export_shopping_list(payload):
+    """Формирует файл списка покупок; payload: user_id и format."""
+    user = User.objects.get(pk=payload['user_id'])
+    renderer = shopping_list.get_renderer(payload['format'])
+    _, chunks = shopping_list.export(user, renderer)
+    return Output(renderer.filename, b''.join(chunks), renderer.media_type)
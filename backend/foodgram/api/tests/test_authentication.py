@@ -0,0 +1,73 @@
+import time
+
+from api import authentication
+from api.authentication import CachedTokenAuthentication
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+
+class TokenRevocationTest(TestCase):
+    """Токен, отозванный в одном процессе, не принимается из LRU другого."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        cache.clear()
+        authentication.local_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        # После delete() у токена обнуляется pk, то есть и key.
+        self.token_key = self.token.key
+        self.key = authentication.get_key(self.token_key)
+
+    def get_me(self):
+        return self.client.get(
+            '/api/users/me/',
+            HTTP_AUTHORIZATION=f'Token {self.token_key}').status_code
+
+    def test_deleted_token_rejected_by_other_process(self):
+        self.assertEqual(self.get_me(), 200)
+        entry = authentication.local_cache.get(self.key)
+        self.token.delete()
+        # LRU другого процесса всё ещё хранит токен.
+        authentication.local_cache.set(self.key, entry)
+        self.assertEqual(self.get_me(), 401)
+
+    def test_changed_user_reloaded_once(self):
+        self.assertEqual(self.get_me(), 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_me(), 401)
+        self.user.is_active = True
+        self.user.save()
+        self.assertEqual(self.get_me(), 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_me(), 200)
+
+    @override_settings(TOKEN_CACHE_SHARED=True)
+    def test_stale_store_after_logout(self):
+        """Запрос, прочитавший токен до выхода, записывает его в кэш уже
+        после: ни общий кэш, ни LRU не должны его принять."""
+        read_at = time.time()
+        token = Token.objects.select_related('user').get(pk=self.token.pk)
+        self.token.delete()
+        CachedTokenAuthentication.store(self.key, token, read_at)
+        self.assertEqual(self.get_me(), 401)
+        authentication.local_cache.clear()
+        self.assertEqual(self.get_me(), 401)
+
+    @override_settings(TOKEN_CACHE_SHARED=True)
+    def test_shared_entry_after_logout(self):
+        """Запись в общем кэше, сделанная до выхода, не попадает в LRU
+        другого процесса после него."""
+        self.assertEqual(self.get_me(), 200)
+        shared = cache.get(self.key)
+        self.token.delete()
+        cache.set(self.key, shared)
+        authentication.local_cache.clear()
+        self.assertEqual(self.get_me(), 401)
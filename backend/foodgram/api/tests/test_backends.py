@@ -0,0 +1,50 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from users.models import User
+
+
+class EmailBackendTest(TestCase):
+    """Вход по email и паролю."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@example.com',
+            password='Secret-password-1', first_name='Имя',
+            last_name='Фамилия')
+
+    def login(self, email, password='Secret-password-1'):
+        return self.client.post('/api/auth/token/login/', {
+            'email': email, 'password': password})
+
+    def test_login(self):
+        response = self.login('reader@example.com')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('auth_token', response.json())
+        self.assertEqual(self.login('reader@example.com', 'wrong')
+                         .status_code, 400)
+        self.assertEqual(self.login('nobody@example.com').status_code, 400)
+
+    def test_email_case_sensitive(self):
+        """Email уникален с учётом регистра: адреса, различающиеся только
+        регистром, принадлежат разным пользователям."""
+        User.objects.create_user(
+            username='other', email='Reader@example.com',
+            password='Other-password-2', first_name='Имя',
+            last_name='Фамилия')
+        self.assertEqual(self.login('reader@example.com').status_code, 200)
+        self.assertEqual(
+            self.login('Reader@example.com', 'Other-password-2').status_code,
+            200)
+        self.assertEqual(self.login('READER@example.com').status_code, 400)
+
+    def test_user_not_cached(self):
+        """Строка пользователя с хэшем пароля не попадает в кэш: каждый
+        вход читает её из БД."""
+        for _ in range(2):
+            with CaptureQueriesContext(connection) as queries:
+                self.login('reader@example.com')
+            self.assertTrue(any(
+                'reader@example.com' in query['sql']
+                for query in queries.captured_queries))
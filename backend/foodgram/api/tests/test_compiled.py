@@ -0,0 +1,66 @@
+import json
+
+from api.compiled import get_plan
+from api.serializers import GetRecipeSerializer
+from api.views import CompiledRecipeSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.test import RequestFactory, TestCase
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+class CompiledRecipeSerializerTest(TestCase):
+    """Скомпилированный сериализатор отдаёт то же, что и исходный."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.reader = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читатель')
+        tags = [Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                                   slug=f'tag{i}') for i in range(2)]
+        ingredient = Ingredient.objects.create(
+            name='Мука', measurement_unit='г')
+        for i in range(3):
+            recipe = Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}',
+                image='recipes/x.png', text='Описание', cooking_time=10,
+                image_card='recipes/card.webp' if i else '')
+            recipe.tags.set(tags[:i])
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=i + 1)
+        Favorite.objects.create(user=cls.reader, recipe=recipe)
+        ShoppingCart.objects.create(user=cls.reader, recipe=recipe)
+        Subscription.objects.create(user=cls.reader, author=cls.author)
+
+    def get_data(self, serializer_class, user):
+        request = RequestFactory().get('/api/recipes/')
+        request.user = user
+        recipes = Recipe.objects.with_related()
+        return json.dumps(serializer_class(
+            recipes, many=True, context={'request': request}).data,
+            ensure_ascii=False)
+
+    def test_same_data(self):
+        for user in (AnonymousUser(), self.reader, AnonymousUser()):
+            with self.subTest(user=user):
+                self.assertEqual(
+                    self.get_data(CompiledRecipeSerializer, user),
+                    self.get_data(GetRecipeSerializer, user))
+
+    def test_viewer_state(self):
+        data = json.loads(self.get_data(CompiledRecipeSerializer, self.reader))
+        self.assertTrue(data[0]['is_favorited'])
+        self.assertTrue(data[0]['is_in_shopping_cart'])
+        self.assertTrue(data[0]['author']['is_subscribed'])
+        self.assertFalse(data[1]['is_favorited'])
+
+    def test_plan_reused_without_context(self):
+        root, fields = get_plan(GetRecipeSerializer)
+        self.get_data(CompiledRecipeSerializer, self.reader)
+        self.assertIs(get_plan(GetRecipeSerializer)[1], fields)
+        self.assertEqual(root._context, {})
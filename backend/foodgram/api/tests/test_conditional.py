@@ -0,0 +1,47 @@
+from api import authentication, response_cache
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from recipes.models import Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+
+class ConditionalGetTest(TestCase):
+    """ETag ленты меняется только после фиксации правки: клиент, который
+    перепроверяет ответ во время транзакции, не получает старые данные
+    под новым ETag."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipes/x.png',
+            text='Описание', cooking_time=10)
+        cls.token = Token.objects.create(user=author)
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local_cache.clear()
+        authentication.local_cache.clear()
+
+    def get(self, **headers):
+        return self.client.get(
+            '/api/recipes/', HTTP_AUTHORIZATION=f'Token {self.token.key}',
+            **headers)
+
+    def test_etag_changes_after_commit(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.recipe.name = 'Новое название'
+                self.recipe.save()
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code,
+                             304)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['results'][0]['name'],
+                         'Новое название')
@@ -0,0 +1,66 @@
+from base64 import b64encode
+
+from api import response_cache
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from recipes.models import Recipe
+from users.models import User
+
+
+class RecipeCursorPaginationTest(TestCase):
+    """Рецепты с одинаковым pub_date (например, созданные до миграции
+    0007) листаются курсором по (pub_date, id) без OFFSET."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', image='recipes/x.png',
+                   text='Описание', cooking_time=10)
+            for i in range(7))
+        Recipe.objects.update(pub_date=timezone.now())
+        cls.expected = list(Recipe.objects.values_list('pk', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local_cache.clear()
+
+    def get_page(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            self.assertNotIn('OFFSET', query['sql'])
+        data = response.json()
+        return [recipe['id'] for recipe in data['results']], data
+
+    def test_pages_through_tied_pub_date(self):
+        url = '/api/recipes/?pagination=cursor&limit=2'
+        pages = []
+        while url:
+            ids, data = self.get_page(url)
+            pages.append(ids)
+            url = data['next']
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(len(pages), 4)
+        self.assertIsNone(data['next'])
+
+        backward = []
+        url = data['previous']
+        while url:
+            ids, data = self.get_page(url)
+            backward = ids + backward
+            url = data['previous']
+        self.assertEqual(backward, self.expected[:-len(pages[-1])])
+
+    def test_invalid_cursor(self):
+        for position in ('p=1', 'p=not-a-date|1'):
+            cursor = b64encode(position.encode()).decode()
+            response = self.client.get(
+                f'/api/recipes/?pagination=cursor&cursor={cursor}')
+            self.assertEqual(response.status_code, 404)
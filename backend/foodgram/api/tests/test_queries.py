@@ -0,0 +1,72 @@
+from api import authentication, response_cache
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+
+class RecipeQueryCountTest(TestCase):
+    """Число запросов к БД на ленту и карточку рецепта не зависит от
+    размера страницы: при возврате N+1 тест упадёт."""
+
+    @classmethod
+    def setUpTestData(cls):
+        authors = [User.objects.create(
+            username=f'author{i}', email=f'author{i}@example.com',
+            first_name='Имя', last_name='Фамилия') for i in range(3)]
+        tags = [Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                                   slug=f'tag{i}') for i in range(3)]
+        ingredients = [Ingredient.objects.create(
+            name=f'Ингредиент {i}', measurement_unit='г') for i in range(5)]
+        for i in range(25):
+            recipe = Recipe.objects.create(
+                author=authors[i % len(authors)], name=f'Рецепт {i}',
+                image='recipes/image.png', text='Описание', cooking_time=10)
+            recipe.tags.set(tags[:i % len(tags) + 1])
+            RecipeIngredient.objects.bulk_create(
+                RecipeIngredient(recipe=recipe, ingredient=ingredient,
+                                 amount=i + 1)
+                for ingredient in ingredients[:i % len(ingredients) + 1])
+        cls.recipe = recipe
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читатель')
+        cls.token = Token.objects.create(user=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local_cache.clear()
+        authentication.local_cache.clear()
+
+    # Анонимно: слаги тегов, COUNT (для карточки — updated_at), рецепты
+    # с авторами и две предвыборки. Пользователю добавляются подписки на
+    # авторов, избранное и список покупок для рецептов страницы.
+    ANONYMOUS_QUERIES = 5
+    AUTHENTICATED_QUERIES = 8
+
+    def get(self, url, authenticated):
+        queries = (self.AUTHENTICATED_QUERIES if authenticated
+                   else self.ANONYMOUS_QUERIES)
+        headers = ({'HTTP_AUTHORIZATION': f'Token {self.token.key}'}
+                   if authenticated else {})
+        if authenticated:
+            # Токен попадает в кэш аутентификации первым запросом.
+            self.client.get(url, **headers)
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_recipe_list(self):
+        for authenticated in (False, True):
+            for limit in (2, 20):
+                with self.subTest(authenticated=authenticated, limit=limit):
+                    response = self.get(
+                        f'/api/recipes/?limit={limit}', authenticated)
+                    self.assertEqual(len(response.json()['results']), limit)
+
+    def test_recipe_detail(self):
+        for authenticated in (False, True):
+            with self.subTest(authenticated=authenticated):
+                self.get(f'/api/recipes/{self.recipe.pk}/', authenticated)
@@ -0,0 +1,36 @@
+from api import response_cache
+from django.core.cache import cache
+from django.test import TestCase
+from recipes.models import Recipe
+from users.models import User
+
+
+class ResponseCacheKeyTest(TestCase):
+    """Закэшированный ответ содержит абсолютные ссылки, поэтому запросы
+    с другим хостом или схемой не должны его получать."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', image='recipes/x.png',
+                   text='Описание', cooking_time=10)
+            for i in range(3))
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local_cache.clear()
+
+    def get_next(self, **extra):
+        response = self.client.get('/api/recipes/?limit=1', **extra)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['next']
+
+    def test_host_and_scheme_in_key(self):
+        self.assertTrue(self.get_next().startswith('http://testserver/'))
+        self.assertTrue(self.get_next(HTTP_HOST='localhost').startswith(
+            'http://localhost/'))
+        self.assertTrue(self.get_next(secure=True).startswith(
+            'https://testserver/'))
@@ -0,0 +1,48 @@
+from api import shopping_list
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from users.models import User
+
+
+class ShoppingListCacheTest(TestCase):
+    """Выгрузка списка покупок сбрасывается после фиксации изменения
+    корзины, а не внутри его транзакции."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipes = []
+        for name in ('Мука', 'Сахар'):
+            recipe = Recipe.objects.create(
+                author=cls.user, name=f'Рецепт {name}',
+                image='recipes/x.png', text='Описание', cooking_time=10)
+            ingredient = Ingredient.objects.create(
+                name=name, measurement_unit='г')
+            RecipeIngredient.objects.create(
+                recipe=recipe, ingredient=ingredient, amount=100)
+            cls.recipes.append(recipe)
+        ShoppingCart.objects.create(user=cls.user, recipe=cls.recipes[0])
+
+    def setUp(self):
+        cache.clear()
+        self.renderer = shopping_list.get_renderer('txt')
+        self.key = shopping_list.get_cache_key(
+            self.user.pk, self.renderer.format)
+
+    def export(self):
+        _, chunks = shopping_list.export(self.user, self.renderer)
+        return b''.join(chunks).decode()
+
+    def test_invalidated_after_commit(self):
+        self.assertNotIn('Сахар', self.export())
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                ShoppingCart.objects.create(
+                    user=self.user, recipe=self.recipes[1])
+            self.assertIsNotNone(cache.get(self.key))
+        self.assertIsNone(cache.get(self.key))
+        self.assertIn('Сахар', self.export())
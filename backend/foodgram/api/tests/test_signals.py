@@ -0,0 +1,86 @@
+from api import generations, response_cache
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from recipes.models import Recipe
+from users.models import User
+
+
+class UserGenerationTest(TestCase):
+    """Поколение USERS, входящее в ключи всех ответов с рецептами,
+    меняется только при правке данных автора, видимых в этих ответах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes/x.png',
+            text='Описание', cooking_time=10)
+        cls.reader = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+
+    def setUp(self):
+        cache.clear()
+        self.initial = generations.get(generations.USERS)
+
+    def assert_bumped(self, bumped):
+        changed = generations.get(generations.USERS) != self.initial
+        self.assertEqual(changed, bumped)
+
+    def test_author_name_change(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.first_name = 'Другое'
+            self.author.save()
+        self.assert_bumped(True)
+
+    def test_unrelated_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, self.author)
+            self.author.set_password('password')
+            self.author.save()
+            self.reader.first_name = 'Другое'
+            self.reader.save()
+        self.assert_bumped(False)
+
+
+class RecipeGenerationTest(TestCase):
+    """Поколения сдвигаются только после фиксации транзакции: пока она
+    не зафиксирована, параллельные запросы получают прежний ответ из
+    кэша и не кэшируют незафиксированное состояние под новым ключом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipe = Recipe.objects.create(
+            author=author, name='Рецепт', image='recipes/x.png',
+            text='Описание', cooking_time=10)
+
+    def setUp(self):
+        cache.clear()
+        response_cache.local_cache.clear()
+
+    def get_name(self):
+        return self.client.get(f'/api/recipes/{self.recipe.pk}/').json()[
+            'name']
+
+    def test_bump_after_commit(self):
+        self.assertEqual(self.get_name(), 'Рецепт')
+        initial = generations.get(generations.recipe(self.recipe.pk))
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                self.recipe.name = 'Новое название'
+                self.recipe.save()
+            self.assertEqual(
+                generations.get(generations.recipe(self.recipe.pk)),
+                initial)
+            self.assertEqual(self.get_name(), 'Рецепт')
+        self.assertTrue(callbacks)
+        self.assertNotEqual(
+            generations.get(generations.recipe(self.recipe.pk)), initial)
+        self.assertEqual(self.get_name(), 'Новое название')
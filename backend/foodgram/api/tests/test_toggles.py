@@ -0,0 +1,87 @@
+from unittest import skipUnless
+
+from api import toggles
+from django.db import connection
+from django.http import Http404
+from django.test import TestCase
+from recipes.models import Favorite, Recipe, ShoppingCart
+from rest_framework.exceptions import ValidationError
+from users.models import Subscription, User
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'переключение одним запросом есть только на PostgreSQL')
+class OneQueryToggleTest(TestCase):
+    """Переключение связей одним запросом (CTE с ON CONFLICT и
+    DELETE ... RETURNING) ведёт себя так же, как вариант через ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Имя', last_name='Фамилия')
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', image='recipes/x.png',
+            text='Описание', cooking_time=10)
+        cls.missing_id = cls.recipe.pk + 1000
+
+    def assert_error(self, message, function, *args):
+        with self.assertRaises(ValidationError) as context:
+            function(*args)
+        self.assertIn(message, str(context.exception.detail))
+
+    def get_count(self, field):
+        return Recipe.objects.values_list(field, flat=True).get(
+            pk=self.recipe.pk)
+
+    def test_recipe_toggles(self):
+        for toggle, model, field in (
+                (toggles.FAVORITE, Favorite, 'favorites_count'),
+                (toggles.SHOPPING_CART, ShoppingCart,
+                 'shopping_cart_count')):
+            with self.subTest(model=model.__name__):
+                link = toggles.add(toggle, self.user, self.recipe.pk)
+                self.assertEqual(link.recipe.pk, self.recipe.pk)
+                self.assertEqual(link.recipe.name, self.recipe.name)
+                self.assertTrue(model.objects.filter(
+                    user=self.user, recipe=self.recipe).exists())
+                self.assertEqual(self.get_count(field), 1)
+
+                self.assert_error(toggle.already_added, toggles.add,
+                                  toggle, self.user, self.recipe.pk)
+                self.assertEqual(model.objects.count(), 1)
+                self.assertEqual(self.get_count(field), 1)
+
+                toggles.remove(toggle, self.user, self.recipe.pk)
+                self.assertFalse(model.objects.exists())
+                self.assertEqual(self.get_count(field), 0)
+
+                self.assert_error(toggle.not_found, toggles.remove,
+                                  toggle, self.user, self.recipe.pk)
+                self.assertEqual(self.get_count(field), 0)
+
+    def test_missing_target(self):
+        for toggle in (toggles.FAVORITE, toggles.SHOPPING_CART,
+                       toggles.SUBSCRIPTION):
+            with self.subTest(toggle=toggle.model.__name__):
+                with self.assertRaises(Http404):
+                    toggles.add(toggle, self.user, self.missing_id)
+                with self.assertRaises(Http404):
+                    toggles.remove(toggle, self.user, self.missing_id)
+
+    def test_subscription(self):
+        link = toggles.add(toggles.SUBSCRIPTION, self.user, self.author.pk)
+        self.assertEqual(link.author.username, self.author.username)
+        self.assertTrue(Subscription.objects.filter(
+            user=self.user, author=self.author).exists())
+        self.assert_error(toggles.SUBSCRIPTION.already_added, toggles.add,
+                          toggles.SUBSCRIPTION, self.user, self.author.pk)
+        self.assert_error(toggles.SUBSCRIPTION.self_error, toggles.add,
+                          toggles.SUBSCRIPTION, self.user, self.user.pk)
+        toggles.remove(toggles.SUBSCRIPTION, self.user, self.author.pk)
+        self.assertFalse(Subscription.objects.exists())
+        self.assert_error(toggles.SUBSCRIPTION.not_found, toggles.remove,
+                          toggles.SUBSCRIPTION, self.user, self.author.pk)
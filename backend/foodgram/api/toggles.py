@@ -0,0 +1,286 @@
+"""Добавление и удаление связей пользователя: избранное, список покупок,
+подписки.
+
+На PostgreSQL переключение — один запрос: CTE находит целевой объект,
+вставляет связь через ON CONFLICT DO NOTHING (или удаляет её с
+RETURNING), меняет денормализованный счётчик и возвращает поля объекта
+для ответа. По результату понятно, есть ли объект и изменилась ли связь,
+поэтому ошибки остаются прежними: 404, «уже добавлен», «нет в списке».
+Сигналы при этом не отправляются, и кэши сбрасываются явно
+(api.signals.relations_changed). На остальных СУБД то же делается через
+ORM: вставка в точке сохранения с перехватом IntegrityError и удаление с
+проверкой числа строк, а счётчики и кэши обновляют сигналы.
+
+Пакет операций (apply_batch) проверяется одним запросом, применяется
+одной вставкой и одним удалением в транзакции и тоже обходится без
+сигналов, поэтому счётчики и кэши меняются явно на любой СУБД.
+"""
+from collections import namedtuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef
+from django.http import Http404
+from recipes import counters
+from recipes.models import Favorite, ShoppingCart
+from rest_framework import exceptions, serializers
+from rest_framework.settings import api_settings
+from users.models import Subscription
+
+from .signals import relations_changed
+
+ADD = 'add'
+REMOVE = 'remove'
+BATCH_ATTEMPTS = 3
+
+Toggle = namedtuple(
+    'Toggle',
+    'model target_field columns counter already_added not_found self_error',
+    defaults=(None,))
+
+RECIPE_COLUMNS = ('id', 'name', 'image', 'image_thumbnail', 'cooking_time')
+
+FAVORITE = Toggle(
+    Favorite, 'recipe', RECIPE_COLUMNS, counters.FAVORITES,
+    'Рецепт уже добавлен в избранное!', 'Рецепта нет в избранном!')
+SHOPPING_CART = Toggle(
+    ShoppingCart, 'recipe', RECIPE_COLUMNS, counters.SHOPPING_CART,
+    'Рецепт уже добавлен в список покупок!', 'Рецепта нет в списке покупок!')
+SUBSCRIPTION = Toggle(
+    Subscription, 'author',
+    ('id', 'email', 'username', 'first_name', 'last_name', 'recipes_count'),
+    None, 'Вы уже подписаны на этого автора',
+    'Вы не подписаны на этого пользователя',
+    'Нельзя подписаться или отписаться от себя!')
+
+ADD_SQL = '''
+    WITH target AS (
+        SELECT {columns} FROM {target_table} WHERE {target_pk} = %s
+    ), changed AS (
+        INSERT INTO {table} ({owner}, {foreign_key})
+        SELECT %s, {target_pk} FROM target
+        ON CONFLICT ({owner}, {foreign_key}) DO NOTHING
+        RETURNING {foreign_key}
+    ){counted}
+    SELECT {columns}, (SELECT COUNT(*) FROM changed) FROM target
+'''
+REMOVE_SQL = '''
+    WITH target AS (
+        SELECT {target_pk} FROM {target_table} WHERE {target_pk} = %s
+    ), changed AS (
+        DELETE FROM {table} WHERE {owner} = %s
+        AND {foreign_key} IN (SELECT {target_pk} FROM target)
+        RETURNING {foreign_key}
+    ){counted}
+    SELECT (SELECT COUNT(*) FROM changed) FROM target
+'''
+COUNTED_SQL = ''', counted AS (
+        UPDATE {counter_table}
+        SET {counter} = GREATEST({counter} + {delta}, 0)
+        WHERE {counter_pk} IN (SELECT {foreign_key} FROM changed)
+    )'''
+
+
+def non_field_error(message):
+    return serializers.ValidationError(
+        {api_settings.NON_FIELD_ERRORS_KEY: [message]})
+
+
+def get_target_model(toggle):
+    return toggle.model._meta.get_field(toggle.target_field).related_model
+
+
+def get_target_fields(toggle):
+    """Поля ответа в порядке полей модели, как того требует from_db."""
+    return [field for field in get_target_model(toggle)._meta.concrete_fields
+            if field.attname in toggle.columns]
+
+
+def get_sql(toggle, template, delta):
+    quote = connection.ops.quote_name
+    opts = toggle.model._meta
+    target = get_target_model(toggle)
+    params = {
+        'table': quote(opts.db_table),
+        'owner': quote(opts.get_field('user').column),
+        'foreign_key': quote(opts.get_field(toggle.target_field).column),
+        'target_table': quote(target._meta.db_table),
+        'target_pk': quote(target._meta.pk.column),
+        'columns': ', '.join(
+            quote(field.column) for field in get_target_fields(toggle)),
+        'counted': '',
+    }
+    if toggle.counter is not None:
+        counter = toggle.counter.target._meta
+        params['counted'] = COUNTED_SQL.format(
+            counter_table=quote(counter.db_table),
+            counter=quote(counter.get_field(toggle.counter.field).column),
+            counter_pk=quote(counter.pk.column),
+            delta=int(delta), foreign_key=params['foreign_key'])
+    return template.format(**params)
+
+
+def check_self(toggle, user, target_id):
+    if toggle.self_error is not None and target_id == user.pk:
+        raise non_field_error(toggle.self_error)
+
+
+def add(toggle, user, target_id):
+    """Создаёт связь user с объектом target_id и возвращает её (с
+    загруженным объектом) для сериализатора ответа."""
+    check_self(toggle, user, target_id)
+    if connection.vendor == 'postgresql':
+        target = add_in_one_query(toggle, user, target_id)
+    else:
+        target = add_with_orm(toggle, user, target_id)
+    return toggle.model(user=user, **{toggle.target_field: target})
+
+
+def add_in_one_query(toggle, user, target_id):
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(toggle, ADD_SQL, 1), (target_id, user.pk))
+        row = cursor.fetchone()
+    if row is None:
+        raise Http404
+    *values, added = row
+    if not added:
+        raise non_field_error(toggle.already_added)
+    relations_changed(toggle.model, [user.pk])
+    return get_target_model(toggle).from_db(
+        connection.alias,
+        [field.attname for field in get_target_fields(toggle)], values)
+
+
+def add_with_orm(toggle, user, target_id):
+    target_model = get_target_model(toggle)
+    target = target_model.objects.only(*toggle.columns).filter(
+        pk=target_id).first()
+    if target is None:
+        raise Http404
+    try:
+        with transaction.atomic():
+            toggle.model.objects.create(
+                user=user, **{toggle.target_field: target})
+    except IntegrityError:
+        raise non_field_error(toggle.already_added)
+    return target
+
+
+def remove(toggle, user, target_id):
+    """Удаляет связь user с объектом target_id."""
+    check_self(toggle, user, target_id)
+    if connection.vendor == 'postgresql':
+        remove_in_one_query(toggle, user, target_id)
+    else:
+        remove_with_orm(toggle, user, target_id)
+
+
+def remove_in_one_query(toggle, user, target_id):
+    with connection.cursor() as cursor:
+        cursor.execute(get_sql(toggle, REMOVE_SQL, -1), (target_id, user.pk))
+        row = cursor.fetchone()
+    if row is None:
+        raise Http404
+    if not row[0]:
+        raise non_field_error(toggle.not_found)
+    relations_changed(toggle.model, [user.pk])
+
+
+def remove_with_orm(toggle, user, target_id):
+    if not get_target_model(toggle).objects.filter(pk=target_id).exists():
+        raise Http404
+    removed, _ = toggle.model.objects.filter(
+        user=user, **{toggle.target_field: target_id}).delete()
+    if not removed:
+        raise non_field_error(toggle.not_found)
+
+
+class ConcurrentChangeError(Exception):
+    """Связи пользователя изменились параллельно с применением пакета."""
+
+
+def apply_batch(toggle, user, operations):
+    """Применяет операции [(ADD или REMOVE, id объекта)] по порядку и
+    возвращает результат каждой: словарь со статусом, как у одиночного
+    запроса, и текстом ошибки. Если связи пользователя успели измениться
+    параллельно, пакет пересчитывается заново."""
+    for attempt in range(1, BATCH_ATTEMPTS + 1):
+        try:
+            with transaction.atomic():
+                results, added, removed = apply_batch_once(
+                    toggle, user, operations)
+        except (IntegrityError, ConcurrentChangeError):
+            if attempt == BATCH_ATTEMPTS:
+                raise
+        else:
+            break
+    if added or removed:
+        relations_changed(toggle.model, [user.pk])
+    return results
+
+
+def apply_batch_once(toggle, user, operations):
+    linked = get_linked(toggle, user, {
+        target_id for _, target_id in operations})
+    initial = {target_id for target_id, is_linked in linked.items()
+               if is_linked}
+    state = set(initial)
+    results = [apply_operation(toggle, user, state, linked, *operation)
+               for operation in operations]
+    added, removed = state - initial, initial - state
+    if added:
+        toggle.model.objects.bulk_create([
+            toggle.model(user=user, **{f'{toggle.target_field}_id': pk})
+            for pk in added])
+    if removed and delete_links(toggle, user, removed) != len(removed):
+        raise ConcurrentChangeError
+    if toggle.counter is not None:
+        counters.adjust(toggle.counter, added, 1)
+        counters.adjust(toggle.counter, removed, -1)
+    return results, added, removed
+
+
+def get_linked(toggle, user, target_ids):
+    """{id объекта: есть ли связь} для существующих объектов, одним
+    запросом."""
+    links = toggle.model.objects.filter(
+        user=user, **{toggle.target_field: OuterRef('pk')})
+    return dict(get_target_model(toggle).objects.filter(
+        pk__in=target_ids).annotate(
+            is_linked=Exists(links)).values_list('pk', 'is_linked'))
+
+
+def apply_operation(toggle, user, state, linked, action, target_id):
+    result = {'id': target_id, 'action': action}
+    try:
+        check_self(toggle, user, target_id)
+        if target_id not in linked:
+            raise exceptions.NotFound
+        if action == ADD:
+            if target_id in state:
+                raise non_field_error(toggle.already_added)
+            state.add(target_id)
+            result['status'] = 201
+        else:
+            if target_id not in state:
+                raise non_field_error(toggle.not_found)
+            state.discard(target_id)
+            result['status'] = 204
+    except exceptions.APIException as error:
+        result['status'] = error.status_code
+        result['errors'] = (error.detail if isinstance(error.detail, dict)
+                            else {'detail': error.detail})
+    return result
+
+
+def delete_links(toggle, user, target_ids):
+    """Удаляет связи без сигналов и возвращает число удалённых строк."""
+    quote = connection.ops.quote_name
+    opts = toggle.model._meta
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(opts.db_table)} '
+            f'WHERE {quote(opts.get_field("user").column)} = %s '
+            f'AND {quote(opts.get_field(toggle.target_field).column)} '
+            f'IN ({", ".join(["%s"] * len(target_ids))})',
+            (user.pk, *target_ids))
+        return cursor.rowcount
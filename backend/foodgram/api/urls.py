@@ -1,9 +1,11 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .views import (CustomUserViewSet, FavoriteRecipeViewSet,
-                    IngredientViewSet, RecipeViewSet, ShoppingCartViewSet,
-                    TagViewSet, UserSubscriptionViewSet)
+                    IngredientViewSet, JobViewSet, RecipeViewSet,
+                    ShoppingCartViewSet, TagViewSet, UserSubscriptionViewSet)
 
 app_name = 'api'
 router = DefaultRouter()
@@ -11,17 +13,26 @@ router.register(r'users', CustomUserViewSet)
 router.register(r'tags', TagViewSet)
 router.register(r'recipes', RecipeViewSet)
 router.register(r'ingredients', IngredientViewSet)
+router.register(r'jobs', JobViewSet, basename='jobs')
 
 urlpatterns = [
     path('users/subscriptions/',
          UserSubscriptionViewSet.as_view({'get': 'subscriptions'})),
+    path('users/subscribe/batch/',
+         UserSubscriptionViewSet.as_view({'post': 'batch'})),
     path('users/<int:author_id>/subscribe/', UserSubscriptionViewSet.as_view(
         {'post': 'subscribe', 'delete': 'subscribe'}), name='user-subscribe'),
+    path('recipes/favorite/batch/',
+         FavoriteRecipeViewSet.as_view({'post': 'batch'})),
     path('recipes/<int:recipe_id>/favorite/', FavoriteRecipeViewSet.as_view(
         {'post': 'favorite', 'delete': 'favorite'})),
+    path('recipes/shopping_cart/batch/',
+         ShoppingCartViewSet.as_view({'post': 'batch'})),
     path('recipes/<int:recipe_id>/shopping_cart/', ShoppingCartViewSet.as_view(
         {'post': 'shopping_cart', 'delete': 'shopping_cart'})),
     path('recipes/download_shopping_cart/',
-         ShoppingCartViewSet.as_view({'get': 'list'})),
-    path('', include(router.urls)),
+         ShoppingCartViewSet.as_view({'get': 'list', 'post': 'export'})),
+    *router.urls,
 ]
+if settings.ASYNC_READ_VIEWS:
+    urlpatterns = async_views.wrap_urls(urlpatterns)
@@ -0,0 +1,91 @@
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+
+class ViewerState:
+    """Состояние объектов для текущего пользователя: избранное, список
+    покупок и подписки.
+
+    Проверяются только id объектов текущей страницы: view заранее
+    передаёт их в prime_*, а первый вопрос по связи загружает все
+    накопленные id одним запросом IN. Анонимный пользователь запросов
+    не делает.
+    """
+    RELATIONS = {
+        'favorites': (Favorite, 'recipe_id'),
+        'shopping_cart': (ShoppingCart, 'recipe_id'),
+        'subscriptions': (Subscription, 'author_id'),
+    }
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = {relation: set() for relation in self.RELATIONS}
+        self.checked = {relation: set() for relation in self.RELATIONS}
+        self.found = {relation: set() for relation in self.RELATIONS}
+
+    def prime(self, relation, ids):
+        self.pending[relation].update(ids)
+
+    def prime_recipes(self, recipes):
+        ids = [recipe.id for recipe in recipes]
+        self.prime('favorites', ids)
+        self.prime('shopping_cart', ids)
+        self.prime('subscriptions', [recipe.author_id for recipe in recipes])
+
+    def prime_users(self, users):
+        self.prime('subscriptions', [user.id for user in users])
+
+    def contains(self, relation, object_id):
+        if not self.user.is_authenticated:
+            return False
+        if object_id not in self.checked[relation]:
+            ids = (self.pending[relation] | {object_id}) - self.checked[
+                relation]
+            model, field = self.RELATIONS[relation]
+            self.found[relation].update(model.objects.filter(
+                user=self.user, **{f'{field}__in': ids}
+            ).values_list(field, flat=True))
+            self.checked[relation] |= ids
+            self.pending[relation].clear()
+        return object_id in self.found[relation]
+
+    def is_favorited(self, recipe_id):
+        return self.contains('favorites', recipe_id)
+
+    def is_in_shopping_cart(self, recipe_id):
+        return self.contains('shopping_cart', recipe_id)
+
+    def is_subscribed(self, author_id):
+        return self.contains('subscriptions', author_id)
+
+
+def get_viewer_state(context):
+    """Общий для всех сериализаторов запроса ViewerState из контекста."""
+    if 'viewer_state' not in context:
+        context['viewer_state'] = ViewerState(context['request'].user)
+    return context['viewer_state']
+
+
+class ViewerStateMixin:
+    """Передаёт сериализаторам один ViewerState на запрос и заранее
+    сообщает ему id объектов страницы."""
+
+    @property
+    def viewer_state(self):
+        if not hasattr(self, '_viewer_state'):
+            self._viewer_state = ViewerState(self.request.user)
+        return self._viewer_state
+
+    def prime_viewer_state(self, objects):
+        pass
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['viewer_state'] = self.viewer_state
+        return context
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.prime_viewer_state(page)
+        return page
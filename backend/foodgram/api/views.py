@@ -1,13 +1,13 @@
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+from django.db.models import F, Prefetch, prefetch_related_objects
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils.http import parse_etags, quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
-from reportlab.pdfbase import pdfmetrics, ttfonts
-from reportlab.pdfgen import canvas
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.models import Ingredient, Recipe, Tag
 from rest_framework import status, viewsets
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.models import Token
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
@@ -17,28 +17,54 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from users.models import Subscription, User
 
+from . import generations, toggles
+from .authentication import CachedTokenAuthentication
+from .compiled import CompiledSerializer
+from .conditional import ConditionalGetMixin
 from .filters import IngredientFilter, RecipeFilter
+from .pagination import RecipeFeedPagination, SubscriptionFeedPagination
 from .permissions import IsAuthorOrReadOnly
-from .serializers import (CustomAuthTokenSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeSerializer,
-                          ShoppingCartSerializer, SubscriptionSerializer,
-                          TagSerializer, UsersSerializer, UserWithRecipes)
+from .response_cache import ResponseCacheMixin
+from .search import get_snapshot
+from .serializers import (BatchSerializer, CustomAuthTokenSerializer,
+                          FavoriteSerializer, GetRecipeSerializer,
+                          IngredientSerializer, JobSerializer,
+                          RecipeSerializer, ShoppingCartSerializer,
+                          SubscriptionSerializer, TagSerializer,
+                          UsersSerializer, UserWithRecipes, get_recipes_limit)
+from .shopping_list import FORMAT_RENDERER_CLASSES, export, get_renderer
+from .tasks import SHOPPING_LIST_EXPORT
+from .viewer_state import ViewerStateMixin
+
+
+def toggle(request, spec, target_id, serializer_class):
+    """POST добавляет связь и отвечает serializer_class, DELETE удаляет."""
+    if request.method == 'DELETE':
+        toggles.remove(spec, request.user, target_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    relation = toggles.add(spec, request.user, target_id)
+    return Response(
+        serializer_class(relation, context={'request': request}).data,
+        status=status.HTTP_201_CREATED)
+
 
+def batch(request, spec):
+    """Применяет пакет операций и отвечает результатом каждой."""
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    return Response(toggles.apply_batch(spec, request.user, [
+        (operation['action'], operation['id'])
+        for operation in serializer.validated_data['operations']]))
 
-class CustomUserViewSet(UserViewSet):
+
+class CustomUserViewSet(ViewerStateMixin, UserViewSet):
     """Вьюсет для работы с пользователями."""
     queryset = User.objects.all()
     serializer_class = UsersSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
 
-    def get_serializer_context(self):
-        return {
-            'request': self.request,
-            'format': self.format_kwarg,
-            'view': self,
-            'subscriptions': set(Subscription.objects.filter(
-                user_id=self.request.user).values_list('author_id', flat=True))
-        }
+    def prime_viewer_state(self, users):
+        self.viewer_state.prime_users(users)
 
 
 class CustomObtainAuthToken(ObtainAuthToken):
@@ -56,7 +82,7 @@ class CustomObtainAuthToken(ObtainAuthToken):
 
 class LogoutView(APIView):
     """Вьюсет для удаления токена."""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def post(self, request):
         token = Token.objects.get(user=request.user)
@@ -64,48 +90,92 @@ class LogoutView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет для обработки запросов на получение ингредиентов."""
+    cache_scopes = validator_scopes = (generations.INGREDIENTS,)
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
-
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        snapshot = get_snapshot()
+        name = request.query_params.get('name')
+        ids = snapshot.ranked(name) if name else snapshot.ids
+        return HttpResponse(snapshot.render(ids),
+                            content_type='application/json')
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().retrieve(request, *args, **kwargs)
+        fragment = get_snapshot().fragments.get(
+            int(kwargs['pk']) if kwargs['pk'].isdigit() else None)
+        if fragment is None:
+            raise Http404
+        return HttpResponse(fragment, content_type='application/json')
+
+
+class TagViewSet(ResponseCacheMixin, ConditionalGetMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Вьюсет для обработки запросов на получение тегов"""
+    cache_scopes = validator_scopes = (generations.TAGS,)
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    """Вьюсет для работы с рецептами."""
-    queryset = Recipe.objects.all()
+class CompiledRecipeSerializer(CompiledSerializer):
+    serializer_class = GetRecipeSerializer
+
+
+class RecipeViewSet(ResponseCacheMixin, ConditionalGetMixin, ViewerStateMixin,
+                    viewsets.ModelViewSet):
+    """Вьюсет для работы с рецептами.
+
+    Список и карточка в JSON сериализуются через read_serializer_class;
+    None возвращает обычный RecipeSerializer.
+    """
+    queryset = Recipe.objects.with_related()
     serializer_class = RecipeSerializer
+    read_serializer_class = CompiledRecipeSerializer
     permission_classes = [IsAuthorOrReadOnly]
+    pagination_class = RecipeFeedPagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        if self.request.user.is_authenticated:
-            subscriptions = set(
-                Subscription.objects.filter(
-                    user_id=self.request.user).values_list(
-                    'author_id', flat=True))
-            favorites = set(
-                Favorite.objects.filter(user_id=self.request.user).values_list(
-                    'recipe_id', flat=True))
-            shopping = set(
-                ShoppingCart.objects.filter(
-                    user_id=self.request.user).values_list(
-                    'recipe_id', flat=True))
-            context['subscriptions'] = subscriptions
-            context['favorites'] = favorites
-            context['shopping'] = shopping
-        return context
+    def prime_viewer_state(self, recipes):
+        self.viewer_state.prime_recipes(recipes)
+
+    def get_serializer_class(self):
+        if (self.read_serializer_class is not None
+                and self.action in ('list', 'retrieve')
+                and self.request.accepted_renderer.format == 'json'):
+            return self.read_serializer_class
+        return super().get_serializer_class()
+
+    @staticmethod
+    def get_scopes(kwargs):
+        recipe = (generations.recipe(kwargs['pk'])
+                  if 'pk' in kwargs else generations.RECIPES)
+        return (recipe, generations.TAGS, generations.INGREDIENTS,
+                generations.USERS)
+
+    def get_cache_scopes(self):
+        return self.get_scopes(self.kwargs)
+
+    get_validator_scopes = get_cache_scopes
+
+    def get_validator_values(self):
+        if 'pk' not in self.kwargs:
+            return ()
+        if not self.kwargs['pk'].isdigit():
+            return None
+        return list(Recipe.objects.filter(
+            pk=self.kwargs['pk']).values_list('updated_at', flat=True)) or None
 
 
 class UserSubscriptionViewSet(viewsets.ModelViewSet):
@@ -114,30 +184,31 @@ class UserSubscriptionViewSet(viewsets.ModelViewSet):
     queryset = Subscription.objects.all()
     lookup_field = 'author_id'
     permission_classes = (IsAuthenticated,)
+    pagination_class = SubscriptionFeedPagination
 
     @action(methods=['POST', 'DELETE'], detail=True)
     def subscribe(self, request, author_id):
-        author = get_object_or_404(User, pk=author_id)
-        user = request.user
-        subscription = Subscription.objects.filter(user=user, author=author)
-        serializer = SubscriptionSerializer(
-            data={'author': author, 'subscription': subscription},
-            context={'request': request})
-        if serializer.is_valid():
-            if request.method == 'POST':
-                serializer.save()
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            elif request.method == 'DELETE':
-                subscription.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return toggle(request, toggles.SUBSCRIPTION, author_id,
+                      SubscriptionSerializer)
+
+    @action(methods=['POST'], detail=False)
+    def batch(self, request):
+        return batch(request, toggles.SUBSCRIPTION)
 
     @action(methods=['GET'], detail=False)
     def subscriptions(self, request):
         user = request.user
-        authors = User.objects.filter(following__user=user)
+        authors = User.objects.filter(following__user=user).annotate(
+            subscription_id=F('following__id')).order_by('-subscription_id')
         page = self.paginate_queryset(authors)
+        recipes = Recipe.objects.filter(author__in=page).only(
+            'id', 'author_id', 'name', 'image', 'image_thumbnail',
+            'cooking_time')
+        limit = get_recipes_limit(request)
+        if limit:
+            recipes = recipes.latest_per_author(limit)
+        prefetch_related_objects(page, Prefetch(
+            'recipes', queryset=recipes, to_attr='recipe_previews'))
         serializer = UserWithRecipes(
             page, many=True,
             context={'request': request})
@@ -148,85 +219,86 @@ class FavoriteRecipeViewSet(viewsets.ModelViewSet):
     """Вьюсет для обработки запросов на добавления
     и удаления избранных рецептов"""
     serializer_class = FavoriteSerializer
+    permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         return Recipe.objects.filter(favorites__user=self.request.user)
 
     @action(methods=['POST', 'DELETE'], detail=True)
     def favorite(self, request, recipe_id):
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        user = request.user
-        favorites = Favorite.objects.filter(user=user, recipe=recipe)
-        serializer = FavoriteSerializer(
-            data={'recipe': recipe, 'favorites': favorites},
-            context={'request': request})
-        if serializer.is_valid():
-            if request.method == 'POST':
-                serializer.save()
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            elif request.method == 'DELETE':
-                favorites.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return toggle(request, toggles.FAVORITE, recipe_id, FavoriteSerializer)
+
+    @action(methods=['POST'], detail=False)
+    def batch(self, request):
+        return batch(request, toggles.FAVORITE)
 
 
 class ShoppingCartViewSet(viewsets.ModelViewSet):
     """Вьюсет для обработки запросов на просмотр, добавление в список покупок.
     Обработка запроса на скачивание списка покупок"""
     serializer_class = ShoppingCartSerializer
+    permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         return Recipe.objects.filter(user=self.request.user)
 
+    def get_renderers(self):
+        if self.action in ('list', 'export'):
+            return [renderer() for renderer in FORMAT_RENDERER_CLASSES]
+        return super().get_renderers()
+
     @action(methods=['GET'], detail=False)
     def list(self, request):
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = (
-            "attachment; filename='shopping_cart.pdf'"
-        )
-        p = canvas.Canvas(response)
-        arial = ttfonts.TTFont('Arial', 'data/arial.ttf')
-        pdfmetrics.registerFont(arial)
-        p.setFont('Arial', 14)
-        p.drawString(100, 750, "Список покупок")
-
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__shopping_cart__user=request.user).values_list(
-            'ingredient__name', 'amount', 'ingredient__measurement_unit')
-
-        ingr_list = {}
-        for name, amount, unit in ingredients:
-            if name not in ingr_list:
-                ingr_list[name] = {'amount': amount, 'unit': unit}
-            else:
-                ingr_list[name]['amount'] += amount
-        height = 700
-
-        p.drawString(100, 750, 'Список покупок')
-        for i, (name, data) in enumerate(ingr_list.items(), start=1):
-            p.drawString(
-                80, height,
-                f"{i}. {name} ({data['unit']}) - {data['amount']}")
-            height -= 25
-        p.showPage()
-        p.save()
+        renderer = get_renderer(request.accepted_renderer.format)
+        etag, chunks = export(
+            request.user, renderer,
+            etags=parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')))
+        if chunks is None:
+            response = HttpResponseNotModified()
+        else:
+            response = StreamingHttpResponse(
+                chunks, content_type=renderer.media_type)
+            response['Content-Disposition'] = (
+                f'attachment; filename="{renderer.filename}"')
+        response['ETag'] = quote_etag(etag)
         return response
 
+    @action(methods=['POST'], detail=False)
+    def export(self, request):
+        """Ставит выгрузку в очередь и сразу отвечает статусом задачи."""
+        renderer = get_renderer(request.accepted_renderer.format)
+        job = enqueue(
+            SHOPPING_LIST_EXPORT,
+            {'user_id': request.user.pk, 'format': renderer.format},
+            user=request.user)
+        return Response(JobSerializer(job, context={'request': request}).data,
+                        status=status.HTTP_202_ACCEPTED)
+
     @action(methods=['POST', 'DELETE'], detail=True)
     def shopping_cart(self, request, recipe_id):
-        recipe = get_object_or_404(Recipe, pk=recipe_id)
-        user = request.user
-        shopping = ShoppingCart.objects.filter(user=user, recipe=recipe)
-        serializer = ShoppingCartSerializer(
-            data={'recipe': recipe, 'shopping': shopping},
-            context={'request': request})
-        if serializer.is_valid():
-            if request.method == 'POST':
-                serializer.save()
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            elif request.method == 'DELETE':
-                shopping.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return toggle(request, toggles.SHOPPING_CART, recipe_id,
+                      ShoppingCartSerializer)
+
+    @action(methods=['POST'], detail=False)
+    def batch(self, request):
+        return batch(request, toggles.SHOPPING_CART)
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Вьюсет для статуса фоновых задач пользователя и скачивания
+    их результата."""
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+    @action(methods=['GET'], detail=True)
+    def download(self, request, pk=None):
+        job = self.get_object()
+        if job.status != Job.DONE or not job.result:
+            return Response({'detail': 'Результат ещё не готов.'},
+                            status=status.HTTP_409_CONFLICT)
+        return FileResponse(job.result.open('rb'), as_attachment=True,
+                            filename=job.result_name,
+                            content_type=job.result_content_type)
@@ -0,0 +1,75 @@
+"""Бэкенд PostgreSQL с проверкой постоянных соединений и пулом.
+
+CONN_HEALTH_CHECKS: соединение, оставшееся открытым с прошлого запроса
+(CONN_MAX_AGE > 0), перед первым запросом к БД проверяется SELECT 1 и
+при обрыве (перезапуск сервера, таймаут на балансировщике) открывается
+заново, а не отдаёт ошибку пользователю.
+
+POOL: при POOL['SIZE'] > 0 соединения берутся из пула процесса
+(foodgram.postgresql.pool) и возвращаются в него при закрытии; тогда
+CONN_MAX_AGE должен быть 0, чтобы соединение освобождалось после каждого
+запроса. Соединение из пула при включённых проверках тоже проверяется.
+"""
+from django.db.backends.postgresql import base
+
+from .pool import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.health_check_done = False
+        self.pool = None
+
+    @property
+    def health_check_enabled(self):
+        return self.settings_dict.get('CONN_HEALTH_CHECKS', False)
+
+    @property
+    def pool_options(self):
+        return self.settings_dict.get('POOL') or {}
+
+    def get_new_connection(self, conn_params):
+        if not self.pool_options.get('SIZE'):
+            return super().get_new_connection(conn_params)
+        self.pool = get_pool(conn_params, self.pool_options)
+        return self.pool.acquire(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params),
+            self.check_pooled if self.health_check_enabled else None)
+
+    @staticmethod
+    def check_pooled(connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except base.Database.Error:
+            return False
+        return True
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
+
+    def _close(self):
+        if self.pool is None or self.connection is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            return self.pool.release(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None and self.health_check_enabled:
+            self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (self.connection is None or not self.health_check_enabled
+                or self.health_check_done):
+            return
+        if not self.is_usable():
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
@@ -0,0 +1,143 @@
+"""Пул соединений с PostgreSQL внутри процесса.
+
+Соединения раздаются потокам процесса (синхронным воркерам с потоками,
+пулу потоков ASGI, пулу проверки паролей) и после закрытия Django
+возвращаются в пул вместо разрыва. Одновременно открыто не больше SIZE
+соединений; поток, которому не хватило соединения, ждёт до TIMEOUT
+секунд и получает OperationalError. Время ожидания копится в статистике,
+которая раз в STATS_INTERVAL секунд пишется в лог foodgram.postgresql.
+"""
+import logging
+import threading
+import time
+from collections import deque
+
+from psycopg2 import Error, OperationalError, extensions
+
+logger = logging.getLogger('foodgram.postgresql')
+
+STATS_INTERVAL = 60
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(conn_params, options):
+    """Пул для набора параметров соединения: у тестовой базы он свой."""
+    key = repr(sorted(conn_params.items()))
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(
+                options['SIZE'], options.get('TIMEOUT', 10),
+                options.get('STATS_INTERVAL', STATS_INTERVAL))
+        return pools[key]
+
+
+def discard(connection):
+    try:
+        connection.close()
+    except Error:
+        pass
+
+
+class ConnectionPool:
+    def __init__(self, size, timeout, stats_interval):
+        self.size = size
+        self.timeout = timeout
+        self.stats_interval = stats_interval
+        self.idle = deque()
+        self.slots = threading.BoundedSemaphore(size)
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.reported_at = time.monotonic()
+
+    def reset_stats(self):
+        self.stats = {
+            'acquired': 0, 'waited': 0, 'wait_total': 0.0, 'wait_max': 0.0,
+            'timeouts': 0, 'opened': 0, 'discarded': 0,
+        }
+
+    def acquire(self, connect, check=None):
+        """Выдаёт свободное соединение, проверенное check, или открывает
+        новое через connect."""
+        started = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            self.record(time.monotonic() - started, timeout=True)
+            raise OperationalError(
+                f'Нет свободного соединения в пуле из {self.size} '
+                f'за {self.timeout} с.')
+        self.record(time.monotonic() - started)
+        try:
+            return self.checkout(connect, check)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def checkout(self, connect, check):
+        while True:
+            with self.lock:
+                connection = self.idle.pop() if self.idle else None
+            if connection is None:
+                connection = connect()
+                self.count('opened')
+                return connection
+            if check is None or check(connection):
+                return connection
+            self.count('discarded')
+            discard(connection)
+
+    def release(self, connection):
+        """Возвращает соединение в пул; соединение с незавершённой
+        транзакцией откатывается, разорванное — закрывается."""
+        try:
+            if connection.closed:
+                raise OperationalError
+            status = connection.get_transaction_status()
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                raise OperationalError
+            if status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            connection.autocommit = True
+        except Error:
+            self.count('discarded')
+            discard(connection)
+        else:
+            with self.lock:
+                self.idle.append(connection)
+        finally:
+            self.slots.release()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def record(self, wait, timeout=False):
+        with self.lock:
+            stats = self.stats
+            if timeout:
+                stats['timeouts'] += 1
+            else:
+                stats['acquired'] += 1
+            if wait >= 0.001:
+                stats['waited'] += 1
+                stats['wait_total'] += wait
+                stats['wait_max'] = max(stats['wait_max'], wait)
+            now = time.monotonic()
+            if now - self.reported_at < self.stats_interval:
+                return
+            idle = len(self.idle)
+            self.reset_stats()
+            self.reported_at = now
+        self.report(stats, idle)
+
+    def report(self, stats, idle):
+        waited = stats['waited']
+        logger.log(
+            logging.WARNING if stats['timeouts'] else logging.INFO,
+            'Пул БД (%s соединений): выдано %s, ждали %s, среднее ожидание '
+            '%.1f мс, максимальное %.1f мс, таймаутов %s, открыто %s, '
+            'закрыто неисправных %s, свободно %s',
+            self.size, stats['acquired'], waited,
+            stats['wait_total'] / waited * 1000 if waited else 0,
+            stats['wait_max'] * 1000, stats['timeouts'], stats['opened'],
+            stats['discarded'], idle)
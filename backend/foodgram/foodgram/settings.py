@@ -31,6 +31,7 @@ INSTALLED_APPS = [
     'recipes',
     'api',
     'users',
+    'jobs',
     'import_export',
 ]
 
@@ -67,18 +68,64 @@ WSGI_APPLICATION = 'foodgram.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Стандартный бэкенд PostgreSQL заменяется обёрткой с проверкой
+# постоянных соединений и пулом в процессе (foodgram.postgresql).
+DB_ENGINE = os.getenv('DB_ENGINE', default='django.db.backends.postgresql')
+if DB_ENGINE == 'django.db.backends.postgresql':
+    DB_ENGINE = 'foodgram.postgresql'
+# Пул нужен воркерам с потоками (ASGI, gunicorn --threads); с ним
+# соединение возвращается в пул после каждого запроса (CONN_MAX_AGE=0).
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', default='0'))
+
 DATABASES = {
     'default': {
-        'ENGINE': os.getenv('DB_ENGINE',
-                            default='django.db.backends.postgresql'),
+        'ENGINE': DB_ENGINE,
         'NAME': os.getenv('DB_NAME', default='postgres'),
         'USER': os.getenv('POSTGRES_USER', default='postgres'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', default='postgres'),
         'HOST': os.getenv('DB_HOST', default='db'),
-        'PORT': os.getenv('DB_PORT', default='5432')
+        'PORT': os.getenv('DB_PORT', default='5432'),
+        'CONN_MAX_AGE': int(os.getenv(
+            'DB_CONN_MAX_AGE', default='0' if DB_POOL_SIZE else '60')),
+        'CONN_HEALTH_CHECKS': os.getenv(
+            'DB_CONN_HEALTH_CHECKS', default='true') == 'true',
+        'POOL': {
+            'SIZE': DB_POOL_SIZE,
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', default='10')),
+        },
+    }
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.postgresql': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
+
+# Кэш общий для всех процессов: в нём лежат поколения данных
+# (api.generations), ответы и токены. Воркер задач (run_jobs), сохраняя
+# варианты картинок рецептов, через сигналы сбрасывает поколения, и
+# бэкенд увидит это, только если кэш у них один: файловый кэш — через
+# общий том в CACHE_LOCATION (том cache в infra/docker-compose.yml),
+# либо Redis/Memcached в CACHE_BACKEND и CACHE_LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION',
+                              default=os.path.join(BASE_DIR, 'cache/')),
     }
 }
 
+# Тесты получают кэш в памяти вместо CACHES (foodgram.test_runner).
+TEST_RUNNER = 'foodgram.test_runner.TestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -119,6 +166,18 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'back_static/')
 MEDIA_URL = '/back_media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'back_media/')
 
+IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40_000_000
+
+JOBS_RESULT_ROOT = os.path.join(BASE_DIR, 'job_results/')
+JOBS_MAX_ATTEMPTS = 3
+JOBS_RETRY_DELAY = 10
+JOBS_STALE_TIMEOUT = 10 * 60
+JOBS_HEARTBEAT_INTERVAL = JOBS_STALE_TIMEOUT / 4
+JOBS_RETENTION = 24 * 60 * 60
+JOBS_POLL_INTERVAL = 1.0
+JOBS_MAINTENANCE_INTERVAL = 60
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -126,12 +185,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
 }
 
+MAX_PAGE_SIZE = 100
+
+# Наибольшее число операций в пакетном запросе к избранному, списку
+# покупок и подпискам.
+TOGGLE_BATCH_MAX_SIZE = 500
+
+# wsgi — gunicorn с синхронными воркерами, asgi — uvicorn и асинхронные
+# обработчики чтения (api.async_views).
+SERVER_MODE = os.getenv('SERVER_MODE', default='wsgi')
+ASYNC_READ_VIEWS = SERVER_MODE == 'asgi'
+
+# Токены кэшируются в LRU процесса на TOKEN_CACHE_TTL секунд и, если
+# включено, в общем кэше на TOKEN_CACHE_SHARED_TTL. Отзыв токена другие
+# процессы видят по отметке в общем кэше (CACHES), которая живёт дольше
+# обеих записей.
+TOKEN_CACHE_SIZE = 4096
+TOKEN_CACHE_TTL = 30
+TOKEN_CACHE_SHARED = os.getenv('TOKEN_CACHE_SHARED', default='') == 'true'
+TOKEN_CACHE_SHARED_TTL = 5 * 60
+
 DJOSER = {
     'PERMISSIONS': {
         'user_list': ['rest_framework.permissions.AllowAny'],
@@ -144,5 +223,31 @@ DJOSER = {
     },
 }
 
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+RESPONSE_CACHE_LRU_SIZE = 512
+
+SHOPPING_LIST_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_LIST_CACHE_MAX_SIZE = 1024 * 1024
+
+# Хэшер паролей по умолчанию — стандартный PBKDF2 Django. Чтобы изменить
+# стоимость хэширования, задайте PASSWORD_HASHER=
+# users.hashers.TunedPBKDF2PasswordHasher и PASSWORD_HASH_ITERATIONS:
+# хэши pbkdf2_sha256 с другим числом итераций пересчитываются при
+# следующем входе, с тем же — остаются как есть.
+PASSWORD_HASH_ITERATIONS = int(
+    os.getenv('PASSWORD_HASH_ITERATIONS', default=0))
+PASSWORD_HASHERS = list(dict.fromkeys([
+    os.getenv('PASSWORD_HASHER',
+              default='django.contrib.auth.hashers.PBKDF2PasswordHasher'),
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]))
+
+LOGIN_HASH_WORKERS = int(os.getenv('LOGIN_HASH_WORKERS', default=4))
+LOGIN_HASH_QUEUE_SIZE = 4 * LOGIN_HASH_WORKERS
+LOGIN_HASH_TIMEOUT = 10
+
 AUTHENTICATION_BACKENDS = ['api.backends.EmailBackend',
                            'django.contrib.auth.backends.ModelBackend']
@@ -1,11 +1,19 @@
+from api.async_views import wrap_urls
 from api.views import CustomObtainAuthToken, LogoutView
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
+auth_urls = [
     path('api/auth/token/login/', CustomObtainAuthToken.as_view(),
          name='custom_auth_token'),
     path('api/auth/token/logout/', LogoutView.as_view(), name='token_logout'),
+]
+if settings.ASYNC_READ_VIEWS:
+    auth_urls = wrap_urls(auth_urls)
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    *auth_urls,
     path('api/', include('api.urls', namespace='api'))
 ]
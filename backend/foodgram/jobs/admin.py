@@ -0,0 +1,11 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'user', 'status', 'attempts',
+                    'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    list_select_related = ('user',)
@@ -0,0 +1,48 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from jobs import queue
+
+
+class Command(BaseCommand):
+    help = ('Воркер фоновых задач: выгрузки списков покупок и уменьшенные '
+            'копии изображений. Можно запускать несколько экземпляров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задачи, готовые к запуску, и выйти.')
+        parser.add_argument(
+            '--sleep', type=float, default=settings.JOBS_POLL_INTERVAL,
+            help='Пауза между опросами пустой очереди, с.')
+
+    def handle(self, once, sleep, **options):
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        last_maintenance = 0
+        while not self.stopping:
+            close_old_connections()
+            if (time.monotonic() - last_maintenance
+                    > settings.JOBS_MAINTENANCE_INTERVAL):
+                queue.requeue_stale()
+                queue.purge()
+                last_maintenance = time.monotonic()
+            job = queue.claim()
+            if job is None:
+                if once:
+                    break
+                time.sleep(sleep)
+                continue
+            started = time.monotonic()
+            succeeded = queue.run(job)
+            self.stdout.write(
+                f'{job.kind} {job.pk}: '
+                f'{"готово" if succeeded else "ошибка"} за '
+                f'{time.monotonic() - started:.2f} с.')
+
+    def stop(self, signum, frame):
+        self.stopping = True
@@ -0,0 +1,163 @@
+"""Очередь задач в таблице Job.
+
+Воркер (manage.py run_jobs) забирает задачу через SELECT ... FOR UPDATE
+SKIP LOCKED, поэтому несколько воркеров не мешают друг другу и не
+блокируются на чужих строках. На СУБД без SKIP LOCKED (SQLite) захват
+всё равно безопасен: статус меняется условным UPDATE, и задачу получает
+только тот, у кого он сработал. Задача, поставленная внутри транзакции,
+станет видна воркеру только после её фиксации.
+
+Пока задача выполняется, поток-пульс раз в JOBS_HEARTBEAT_INTERVAL
+обновляет locked_at, поэтому requeue_stale забирает только задачи
+остановившихся воркеров. Итог задачи записывается условным UPDATE по
+статусу и locked_at: если задачу всё же вернули в очередь и её взял
+другой воркер, запись прежнего теряется, а не затирает чужой результат.
+"""
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(kind, payload=None, user=None):
+    get_task(kind)
+    return Job.objects.create(kind=kind, payload=payload or {}, user=user)
+
+
+def claim():
+    """Переводит первую готовую к запуску задачу в RUNNING и возвращает
+    её или None, если очередь пуста."""
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Job.objects.filter(
+            status=Job.PENDING, run_after__lte=now).order_by('run_after')
+        if connection.features.has_select_for_update_skip_locked:
+            queryset = queryset.select_for_update(skip_locked=True)
+        job = queryset.first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_at=now, attempts=job.attempts + 1)
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def owned(job):
+    """Задача, пока её выполняет этот воркер."""
+    return Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, locked_at=job.locked_at)
+
+
+def save_outcome(job, **values):
+    """Записывает итог задачи, если она всё ещё за этим воркером."""
+    if not owned(job).update(**values):
+        logger.warning('Задача %s (%s) уже не принадлежит воркеру, '
+                       'результат отброшен', job.pk, job.kind)
+        return False
+    for name, value in values.items():
+        setattr(job, name, value)
+    return True
+
+
+def finish(job, output):
+    values = {'status': Job.DONE, 'finished_at': timezone.now(),
+              'error': ''}
+    if output is not None:
+        job.result.save(output.filename, ContentFile(output.content),
+                        save=False)
+        values.update(result=job.result.name, result_name=output.filename,
+                      result_content_type=output.content_type)
+    if not save_outcome(job, **values) and output is not None:
+        job.result.delete(save=False)
+
+
+def fail(job, error):
+    """Возвращает задачу в очередь с экспоненциальной задержкой или, после
+    JOBS_MAX_ATTEMPTS попыток, помечает её как FAILED."""
+    if job.attempts >= settings.JOBS_MAX_ATTEMPTS:
+        save_outcome(job, status=Job.FAILED, error=error,
+                     finished_at=timezone.now())
+    else:
+        save_outcome(job, status=Job.PENDING, error=error,
+                     run_after=timezone.now() + timedelta(
+                         seconds=settings.JOBS_RETRY_DELAY
+                         * 2 ** (job.attempts - 1)))
+
+
+class Heartbeat(threading.Thread):
+    """Обновляет locked_at задачи, пока она выполняется."""
+
+    def __init__(self, job):
+        super().__init__(daemon=True)
+        self.job = job
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(settings.JOBS_HEARTBEAT_INTERVAL):
+                now = timezone.now()
+                if not owned(self.job).update(locked_at=now):
+                    break
+                self.job.locked_at = now
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run(job):
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        output = get_task(job.kind)(job.payload)
+    except Exception:
+        heartbeat.stop()
+        logger.exception('Задача %s (%s) завершилась ошибкой',
+                         job.pk, job.kind)
+        fail(job, traceback.format_exc())
+        return False
+    heartbeat.stop()
+    finish(job, output)
+    return True
+
+
+STALE_ERROR = 'Воркер остановился, не завершив задачу.'
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи воркеров, упавших посреди работы, и
+    возвращает их число. Задачи, исчерпавшие JOBS_MAX_ATTEMPTS попыток
+    (например, из-за которых воркер и падает), помечаются как FAILED."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_STALE_TIMEOUT))
+    stale.filter(attempts__gte=settings.JOBS_MAX_ATTEMPTS).update(
+        status=Job.FAILED, finished_at=now, error=STALE_ERROR)
+    return stale.filter(attempts__lt=settings.JOBS_MAX_ATTEMPTS).update(
+        status=Job.PENDING)
+
+
+def purge():
+    """Удаляет завершённые задачи старше JOBS_RETENTION вместе с файлами."""
+    expired = Job.objects.filter(
+        status__in=(Job.DONE, Job.FAILED),
+        finished_at__lt=timezone.now() - timedelta(
+            seconds=settings.JOBS_RETENTION))
+    for job in expired.exclude(result='').only('pk', 'result').iterator():
+        job.result.delete(save=False)
+    return expired.delete()[0]
@@ -0,0 +1,23 @@
+"""Реестр фоновых задач.
+
+Задача — функция от словаря payload, объявленная в модуле tasks.py
+любого приложения с декоратором @task('имя'). Если задача создаёт файл,
+она возвращает Output; файл сохраняется в Job.result и отдаётся через
+API.
+"""
+from collections import namedtuple
+
+Output = namedtuple('Output', 'filename content content_type')
+
+TASKS = {}
+
+
+def task(name):
+    def decorator(function):
+        TASKS[name] = function
+        return function
+    return decorator
+
+
+def get_task(name):
+    return TASKS[name]
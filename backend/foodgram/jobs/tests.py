@@ -0,0 +1,123 @@
+import threading
+import time
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from jobs import queue
+from jobs.models import Job
+
+
+class RequeueStaleTest(TestCase):
+    """Зависшие задачи возвращаются в очередь, пока не исчерпаны попытки."""
+
+    def create_job(self, attempts):
+        return Job.objects.create(
+            kind='test', status=Job.RUNNING, attempts=attempts,
+            locked_at=timezone.now() - timedelta(
+                seconds=settings.JOBS_STALE_TIMEOUT + 1))
+
+    def test_requeue_stale(self):
+        retried = self.create_job(settings.JOBS_MAX_ATTEMPTS - 1)
+        exhausted = self.create_job(settings.JOBS_MAX_ATTEMPTS)
+        running = Job.objects.create(
+            kind='test', status=Job.RUNNING, attempts=1,
+            locked_at=timezone.now())
+
+        self.assertEqual(queue.requeue_stale(), 1)
+
+        for job in (retried, exhausted, running):
+            job.refresh_from_db()
+        self.assertEqual(retried.status, Job.PENDING)
+        self.assertEqual(exhausted.status, Job.FAILED)
+        self.assertEqual(exhausted.error, queue.STALE_ERROR)
+        self.assertIsNotNone(exhausted.finished_at)
+        self.assertEqual(running.status, Job.RUNNING)
+
+
+class OutcomeTest(TestCase):
+    """Итог записывается, только пока задача за этим воркером."""
+
+    def setUp(self):
+        Job.objects.create(kind='test', status=Job.RUNNING, attempts=1,
+                           locked_at=timezone.now())
+        self.job = Job.objects.get()
+
+    def test_finish(self):
+        queue.finish(self.job, None)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.status, Job.DONE)
+
+    def test_taken_by_other_worker(self):
+        stale = Job.objects.get()
+        Job.objects.update(locked_at=timezone.now() + timedelta(seconds=1))
+        queue.finish(stale, None)
+        self.assertEqual(Job.objects.get().status, Job.RUNNING)
+
+    def test_failed_not_flipped_to_done(self):
+        stale = Job.objects.get()
+        Job.objects.update(status=Job.FAILED, error=queue.STALE_ERROR)
+        queue.finish(stale, None)
+        queue.fail(stale, 'ошибка')
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.error, queue.STALE_ERROR)
+
+
+class HeartbeatTest(TransactionTestCase):
+    """Пульс продлевает locked_at выполняющейся задачи."""
+
+    @override_settings(JOBS_HEARTBEAT_INTERVAL=0.05)
+    def test_heartbeat(self):
+        job = Job.objects.create(kind='test', status=Job.RUNNING,
+                                 attempts=1, locked_at=timezone.now())
+        locked_at = job.locked_at
+        heartbeat = queue.Heartbeat(job)
+        heartbeat.start()
+        time.sleep(0.3)
+        heartbeat.stop()
+        self.assertGreater(job.locked_at, locked_at)
+        self.assertEqual(Job.objects.get().locked_at, job.locked_at)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'SELECT ... FOR UPDATE SKIP LOCKED проверяется на PostgreSQL')
+class SkipLockedClaimTest(TransactionTestCase):
+    """claim не ждёт задачу, заблокированную другим воркером, а берёт
+    следующую."""
+
+    def test_claim_skips_locked(self):
+        now = timezone.now()
+        first = Job.objects.create(
+            kind='test', run_after=now - timedelta(seconds=2))
+        second = Job.objects.create(
+            kind='test', run_after=now - timedelta(seconds=1))
+        locked, release = threading.Event(), threading.Event()
+
+        def hold():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=first.pk)
+                    locked.set()
+                    release.wait(5)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=hold)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            with CaptureQueriesContext(connection) as queries:
+                claimed = queue.claim()
+        finally:
+            release.set()
+            thread.join()
+        self.assertEqual(claimed.pk, second.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertTrue(any('SKIP LOCKED' in query['sql']
+                            for query in queries.captured_queries))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, Job.PENDING)
@@ -1,7 +1,9 @@
 from django.contrib import admin
 from import_export.admin import ImportExportModelAdmin
 
+from . import images, search
 from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .tasks import schedule_renditions
 
 
 @admin.register(Ingredient)
@@ -17,6 +19,19 @@ class RecipeIngredientInline(admin.TabularInline):
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
     inlines = [RecipeIngredientInline]
+    list_display = ('name', 'author', 'favorites_count')
+    list_select_related = ('author',)
+
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            images.attach(obj, obj.image)
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            schedule_renditions(obj)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        search.update_documents([form.instance.pk])
 
 
 admin.site.register(Tag)
@@ -0,0 +1,42 @@
+"""Денормализованные счётчики.
+
+Счётчики меняются атомарным UPDATE ... SET x = x + delta в той же
+транзакции, что и изменение строки-источника (см. recipes.signals).
+Если счётчики разошлись с данными, их пересчитывает команда recount.
+"""
+from collections import Counter as Deltas
+from collections import namedtuple
+
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from users.models import User
+
+from .models import Favorite, Recipe, ShoppingCart
+
+Counter = namedtuple('Counter', 'source target foreign_key field')
+
+RECIPES = Counter(Recipe, User, 'author_id', 'recipes_count')
+FAVORITES = Counter(Favorite, Recipe, 'recipe_id', 'favorites_count')
+SHOPPING_CART = Counter(
+    ShoppingCart, Recipe, 'recipe_id', 'shopping_cart_count')
+COUNTERS = (RECIPES, FAVORITES, SHOPPING_CART)
+
+
+def adjust(counter, target_ids, delta=1):
+    """Меняет счётчик на delta для каждого вхождения id в target_ids."""
+    by_delta = {}
+    for target_id, times in Deltas(target_ids).items():
+        by_delta.setdefault(times * delta, []).append(target_id)
+    for value, ids in by_delta.items():
+        counter.target.objects.filter(pk__in=ids).update(**{
+            counter.field: Greatest(F(counter.field) + value, Value(0))})
+
+
+def recount(counter, target_ids):
+    """Пересчитывает счётчик для указанных объектов по исходной таблице."""
+    counts = counter.source.objects.filter(
+        **{counter.foreign_key: OuterRef('pk')}
+    ).order_by().values(counter.foreign_key).annotate(
+        total=Count('pk')).values('total')
+    return counter.target.objects.filter(pk__in=target_ids).update(**{
+        counter.field: Coalesce(Subquery(counts), Value(0))})
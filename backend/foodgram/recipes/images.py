@@ -0,0 +1,126 @@
+"""Приём изображений рецептов.
+
+Картинка из data URI декодируется с ограничением размера, проверяется
+и перекодируется Pillow (метаданные EXIF при этом отбрасываются,
+ориентация применяется к пикселям), а файлы получают имена по хэшу
+содержимого. Уменьшенные копии для карточки рецепта и
+для превью в списках строит фоновая задача recipes.renditions (см.
+recipes/tasks.py), пока их нет, API отдаёт оригинал.
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+DATA_URI_PREFIX = 'data:image/'
+DATA_URI_SEPARATOR = ';base64,'
+FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+JPEG_QUALITY = 85
+RENDITIONS = {
+    'card': (600, 600),
+    'thumbnail': (200, 200),
+}
+
+
+class ImageError(ValueError):
+    """Изображение не прошло проверку."""
+
+
+def check_size(size):
+    if size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ImageError(
+            'Размер изображения не должен превышать '
+            f'{settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.')
+
+
+def decode_data_uri(data):
+    """Декодирует data:image/...;base64,...
+
+    Пробелы и переводы строк (base64 с переносом строк) пропускаются.
+    Размер проверяется по длине строки до декодирования, так что слишком
+    большое изображение не декодируется вовсе.
+    """
+    header, separator, encoded = data.partition(DATA_URI_SEPARATOR)
+    if not separator or not header.startswith(DATA_URI_PREFIX):
+        raise ImageError('Ожидается изображение в формате data URI base64.')
+    encoded = ''.join(encoded.split())
+    check_size(len(encoded) // 4 * 3)
+    try:
+        return base64.b64decode(encoded, validate=True)
+    except binascii.Error:
+        raise ImageError('Некорректные данные base64.')
+
+
+def open_image(content):
+    """Проверяет файл и возвращает загруженное изображение Pillow."""
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            image.verify()
+        image = Image.open(io.BytesIO(content))
+        if image.format not in FORMATS:
+            raise ImageError(
+                f'Поддерживаются форматы: {", ".join(FORMATS)}.')
+        width, height = image.size
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            raise ImageError('Слишком большое разрешение изображения.')
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        raise ImageError('Файл не является корректным изображением.')
+    return ImageOps.exif_transpose(image)
+
+
+def has_alpha(image):
+    return (image.mode in ('RGBA', 'LA')
+            or (image.mode == 'P' and 'transparency' in image.info))
+
+
+def encode(image):
+    """Сохраняет изображение без метаданных: PNG, если есть
+    прозрачность, иначе JPEG. Возвращает (байты, расширение)."""
+    buffer = io.BytesIO()
+    if has_alpha(image):
+        image.convert('RGBA').save(buffer, 'PNG', optimize=True)
+        return buffer.getvalue(), 'png'
+    image.convert('RGB').save(
+        buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue(), 'jpg'
+
+
+def make_rendition(image, size):
+    rendition = image.copy()
+    rendition.thumbnail(size, Image.Resampling.LANCZOS)
+    return encode(rendition)
+
+
+def process(content):
+    """Проверяет и перекодирует изображение, имя файла — хэш содержимого."""
+    check_size(len(content))
+    original, extension = encode(open_image(content))
+    digest = hashlib.sha256(original).hexdigest()[:32]
+    return ContentFile(original, name=f'{digest}.{extension}')
+
+
+def make_renditions(file):
+    """Возвращает {имя копии: ContentFile} для сохранённого оригинала."""
+    with file.open('rb'):
+        content = file.read()
+    image = open_image(content)
+    digest = os.path.splitext(os.path.basename(file.name))[0]
+    renditions = {}
+    for name, size in RENDITIONS.items():
+        rendition, extension = make_rendition(image, size)
+        renditions[name] = ContentFile(
+            rendition, name=f'{digest}_{name}.{extension}')
+    return renditions
+
+
+def attach(recipe, image):
+    """Записывает в рецепт новый оригинал и сбрасывает старые копии."""
+    recipe.image = image
+    for name in RENDITIONS:
+        setattr(recipe, f'image_{name}', '')
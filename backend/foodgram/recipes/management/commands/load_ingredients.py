@@ -0,0 +1,129 @@
+import csv
+import json
+import os
+import time
+from tempfile import SpooledTemporaryFile
+
+from api import generations
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv')
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def read_json(file):
+    """Потоково читает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(READ_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                raise CommandError('Файл JSON обрывается.')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+class Command(BaseCommand):
+    help = ('Загружает ингредиенты из CSV (name,measurement_unit) или JSON. '
+            'Повторная загрузка не создаёт дубликатов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY даже на PostgreSQL.')
+
+    def handle(self, path, batch_size, no_copy, **options):
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json.')
+        started = time.monotonic()
+        before = Ingredient.objects.count()
+        with open(path, encoding='utf-8') as file:
+            rows = self.deduplicate(reader(file))
+            if connection.vendor == 'postgresql' and not no_copy:
+                read = self.copy(rows)
+            else:
+                read = self.bulk_create(rows, batch_size)
+        created = Ingredient.objects.count() - before
+        elapsed = time.monotonic() - started
+        generations.bump(generations.INGREDIENTS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Прочитано {read}, добавлено {created} ингредиентов '
+            f'за {elapsed:.2f} с ({read / max(elapsed, 1e-6):.0f} строк/с).'))
+
+    @staticmethod
+    def deduplicate(rows):
+        seen = set()
+        for name, unit in rows:
+            key = (name.strip(), unit.strip())
+            if key[0] and key not in seen:
+                seen.add(key)
+                yield key
+
+    @staticmethod
+    def bulk_create(rows, batch_size):
+        read = 0
+        batch = []
+        with transaction.atomic():
+            for name, unit in rows:
+                batch.append(Ingredient(name=name, measurement_unit=unit))
+                if len(batch) >= batch_size:
+                    Ingredient.objects.bulk_create(
+                        batch, ignore_conflicts=True)
+                    read += len(batch)
+                    batch = []
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return read + len(batch)
+
+    @staticmethod
+    def copy(rows):
+        """Заливает строки через COPY во временную таблицу и переносит
+        новые одним INSERT ... ON CONFLICT DO NOTHING."""
+        read = 0
+        with SpooledTemporaryFile(max_size=16 * 1024 * 1024,
+                                  mode='w+', encoding='utf-8',
+                                  newline='') as buffer:
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(row)
+                read += 1
+            buffer.seek(0)
+            table = connection.ops.quote_name(Ingredient._meta.db_table)
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    'CREATE TEMP TABLE ingredient_staging '
+                    '(name varchar(200), measurement_unit varchar(200)) '
+                    'ON COMMIT DROP')
+                cursor.copy_expert(
+                    'COPY ingredient_staging (name, measurement_unit) '
+                    'FROM STDIN WITH (FORMAT csv)', buffer)
+                cursor.execute(
+                    f'INSERT INTO {table} (name, measurement_unit) '
+                    'SELECT name, measurement_unit FROM ingredient_staging '
+                    'ON CONFLICT (name, measurement_unit) DO NOTHING')
+        return read
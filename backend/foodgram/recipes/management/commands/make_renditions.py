@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.tasks import schedule_renditions
+
+
+class Command(BaseCommand):
+    help = ('Ставит в очередь построение уменьшенных копий для рецептов, '
+            'у которых их ещё нет.')
+
+    def handle(self, **options):
+        recipes = Recipe.objects.filter(image_card='').exclude(
+            image='').only('pk', 'image')
+        count = 0
+        for recipe in recipes.iterator():
+            schedule_renditions(recipe)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Поставлено задач: {count}.'))
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes import counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает денормализованные счётчики: рецепты автора, '
+            'добавления рецепта в избранное и в списки покупок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, batch_size, **options):
+        for counter in counters.COUNTERS:
+            started = time.monotonic()
+            updated = 0
+            ids = counter.target.objects.order_by('pk').values_list(
+                'pk', flat=True)
+            last_id = 0
+            while True:
+                batch = list(ids.filter(pk__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                with transaction.atomic():
+                    updated += counters.recount(counter, batch)
+                last_id = batch[-1]
+            self.stdout.write(self.style.SUCCESS(
+                f'{counter.target.__name__}.{counter.field}: '
+                f'пересчитано {updated} за '
+                f'{time.monotonic() - started:.2f} с.'))
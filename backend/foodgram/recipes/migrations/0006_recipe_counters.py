@@ -0,0 +1,47 @@
+# Generated by Django 3.2.18 on 2026-10-17 06:00
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Recipe', 'users', 'User', 'author', 'recipes_count'),
+    ('recipes', 'Favorite', 'recipes', 'Recipe', 'recipe', 'favorites_count'),
+    ('recipes', 'ShoppingCart', 'recipes', 'Recipe', 'recipe',
+     'shopping_cart_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for (source_app, source, target_app, target,
+         foreign_key, field) in COUNTERS:
+        Source = apps.get_model(source_app, source)
+        Target = apps.get_model(target_app, target)
+        counts = Source.objects.filter(
+            **{foreign_key: OuterRef('pk')}
+        ).order_by().values(foreign_key).annotate(
+            total=Count('pk')).values('total')
+        Target.objects.update(
+            **{field: Coalesce(Subquery(counts), Value(0))})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_unique'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
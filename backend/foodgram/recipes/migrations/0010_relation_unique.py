@@ -0,0 +1,68 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+MAX_AMOUNT = 32767
+
+
+def merge_recipe_ingredients(apps, schema_editor):
+    """Склеивает повторы ингредиента в рецепте, складывая количество."""
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    duplicates = RecipeIngredient.objects.values(
+        'recipe_id', 'ingredient_id'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id'), amount=Sum('amount')
+    ).filter(total__gt=1)
+    for group in duplicates:
+        RecipeIngredient.objects.filter(pk=group['keep_id']).update(
+            amount=min(group['amount'], MAX_AMOUNT))
+        RecipeIngredient.objects.filter(
+            recipe_id=group['recipe_id'],
+            ingredient_id=group['ingredient_id']
+        ).exclude(id=group['keep_id']).delete()
+
+
+def remove_duplicate_carts(apps, schema_editor):
+    """Удаляет повторные строки списка покупок и пересчитывает счётчик
+    shopping_cart_count у затронутых рецептов."""
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    duplicates = ShoppingCart.objects.values(
+        'user_id', 'recipe_id'
+    ).annotate(
+        keep_id=Min('id'), total=Count('id')
+    ).filter(total__gt=1)
+    recipe_ids = set()
+    for group in duplicates:
+        ShoppingCart.objects.filter(
+            user_id=group['user_id'], recipe_id=group['recipe_id']
+        ).exclude(id=group['keep_id']).delete()
+        recipe_ids.add(group['recipe_id'])
+    counts = ShoppingCart.objects.filter(
+        recipe_id=OuterRef('pk')
+    ).order_by().values('recipe_id').annotate(
+        total=Count('pk')).values('total')
+    Recipe.objects.filter(pk__in=recipe_ids).update(
+        shopping_cart_count=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_image_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_recipe_ingredients,
+                             migrations.RunPython.noop),
+        migrations.RunPython(remove_duplicate_carts,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='recipeingredient',
+            constraint=models.UniqueConstraint(fields=('recipe', 'ingredient'), name='unique_recipe_ingredient'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+    ]
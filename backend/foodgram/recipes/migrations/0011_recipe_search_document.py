@@ -0,0 +1,66 @@
+from django.db import migrations, models
+
+VECTOR = '''
+    setweight(to_tsvector('russian', split_part(search_document, E'\\n', 1)),
+              'A')
+    || setweight(to_tsvector('russian',
+                             split_part(search_document, E'\\n', 2)), 'B')
+    || setweight(to_tsvector('russian', regexp_replace(
+           search_document, E'^[^\\n]*\\n[^\\n]*\\n?', '')), 'C')
+'''
+
+
+def clean(value):
+    return ' '.join(value.split())
+
+
+def fill_documents(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    names = {}
+    for recipe_id, name in RecipeIngredient.objects.order_by(
+            'pk').values_list('recipe_id', 'ingredient__name'):
+        names.setdefault(recipe_id, []).append(name)
+    recipes = []
+    for recipe in Recipe.objects.only('pk', 'name', 'text').iterator():
+        recipe.search_document = '\n'.join((
+            clean(recipe.name), clean(' '.join(names.get(recipe.pk, ()))),
+            recipe.text)).lower()
+        recipes.append(recipe)
+    Recipe.objects.bulk_update(recipes, ['search_document'], batch_size=500)
+
+
+def create_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe ADD COLUMN search_vector tsvector '
+        f'GENERATED ALWAYS AS ({VECTOR}) STORED')
+    schema_editor.execute(
+        'CREATE INDEX recipes_recipe_search_idx '
+        'ON recipes_recipe USING gin (search_vector)')
+
+
+def drop_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipes_recipe_search_idx')
+    schema_editor.execute(
+        'ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_relation_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_vector, drop_vector),
+    ]
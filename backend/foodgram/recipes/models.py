@@ -1,5 +1,7 @@
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
 from users.models import User
 
 
@@ -16,15 +18,65 @@ class Ingredient(models.Model):
     name = models.CharField(max_length=200, db_index=True)
     measurement_unit = models.CharField(max_length=200)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'measurement_unit'],
+                                    name='unique_ingredient'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+
+    @staticmethod
+    def prefetch_lookups():
+        return (
+            'tags',
+            models.Prefetch(
+                'recipe_ingredient',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient')
+            ),
+        )
+
+    def latest_per_author(self, limit):
+        """Оставляет не больше limit последних рецептов каждого автора.
+
+        Django 3.2 не умеет фильтровать по оконной функции, поэтому
+        ранжирование ROW_NUMBER() выполняется во вложенном запросе.
+        """
+        ranked = self.order_by().annotate(
+            row_number=Window(
+                expression=RowNumber(),
+                partition_by=[models.F('author_id')],
+                order_by=[models.F('pub_date').desc(),
+                          models.F('id').desc()]
+            )
+        ).values('id', 'row_number')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) ranked WHERE row_number <= %s',
+            (*params, limit)
+        ))
+
+    def with_related(self):
+        """Загружает связанные объекты, нужные для вывода рецепта,
+        фиксированным числом запросов независимо от размера страницы."""
+        return self.select_related('author').prefetch_related(
+            *self.prefetch_lookups())
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='recipes')
     name = models.CharField(max_length=255)
-    image = models.ImageField('recipes/')
+    image = models.ImageField(upload_to='recipes/')
+    image_card = models.ImageField(
+        upload_to='recipes/renditions/', blank=True, editable=False)
+    image_thumbnail = models.ImageField(
+        upload_to='recipes/renditions/', blank=True, editable=False)
     text = models.TextField()
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -36,15 +88,25 @@ class Recipe(models.Model):
     is_in_shopping_cart = models.BooleanField(default=False)
     cooking_time = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1)])
+    pub_date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    favorites_count = models.PositiveIntegerField(default=0, editable=False)
+    shopping_cart_count = models.PositiveIntegerField(
+        default=0, editable=False)
+    search_document = models.TextField(blank=True, editable=False)
+
+    objects = RecipeQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('-pub_date', '-id')
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_feed_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        self.author.recipes_count = self.author.recipes.count()
-        self.author.save()
-
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE,
@@ -53,6 +115,12 @@ class RecipeIngredient(models.Model):
     amount = models.PositiveSmallIntegerField(
         validators=[MinValueValidator(1)], default=1)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['recipe', 'ingredient'],
+                                    name='unique_recipe_ingredient'),
+        ]
+
 
 class Favorite(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE,
@@ -75,3 +143,9 @@ class ShoppingCart(models.Model):
         on_delete=models.CASCADE,
         related_name='shopping_cart',
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'recipe'],
+                                    name='unique_shopping_cart'),
+        ]
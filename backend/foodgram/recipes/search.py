@@ -0,0 +1,88 @@
+"""Полнотекстовый поиск рецептов.
+
+У каждого рецепта есть поисковый документ search_document: название,
+названия ингредиентов и текст, по строке на часть, в нижнем регистре.
+Документ пересобирается явно (update_documents) после сохранения рецепта
+с ингредиентами — в API, в админке и при переименовании ингредиента.
+
+На PostgreSQL из документа строится генерируемый столбец search_vector
+(tsvector с весами A, B и C для частей) с GIN-индексом, см. миграцию
+0011; запрос разбирается websearch_to_tsquery, результаты сортируются по
+ts_rank. На остальных СУБД (SQLite в тестах) документ должен содержать
+все слова запроса, а выше идут рецепты, название которых начинается с
+запроса.
+"""
+from django.db import connections
+from django.db.models import (BooleanField, Case, FloatField, IntegerField, Q,
+                              Value, When)
+from django.db.models.expressions import RawSQL
+
+from .models import Recipe, RecipeIngredient
+
+CONFIG = 'russian'
+MAX_TERMS = 10
+TSQUERY = 'websearch_to_tsquery(%s::regconfig, %s)'
+
+
+def clean(value):
+    return ' '.join(value.split())
+
+
+def build_document(name, text, ingredient_names):
+    return '\n'.join((
+        clean(name), clean(' '.join(ingredient_names)), text)).lower()
+
+
+def update_documents(recipe_ids):
+    """Пересобирает поисковые документы рецептов."""
+    recipes = Recipe.objects.filter(pk__in=recipe_ids).only(
+        'pk', 'name', 'text', 'search_document')
+    names = {}
+    for recipe_id, name in RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids).order_by('pk').values_list(
+                'recipe_id', 'ingredient__name'):
+        names.setdefault(recipe_id, []).append(name)
+    changed = []
+    for recipe in recipes:
+        document = build_document(
+            recipe.name, recipe.text, names.get(recipe.pk, ()))
+        if document != recipe.search_document:
+            recipe.search_document = document
+            changed.append(recipe)
+    Recipe.objects.bulk_update(changed, ['search_document'])
+
+
+def search_postgresql(queryset, value):
+    vector = '{}.{}'.format(
+        *map(connections[queryset.db].ops.quote_name,
+             (Recipe._meta.db_table, 'search_vector')))
+    params = (CONFIG, value)
+    return queryset.filter(
+        RawSQL(f'{vector} @@ {TSQUERY}', params, output_field=BooleanField())
+    ).annotate(
+        search_rank=RawSQL(f'ts_rank({vector}, {TSQUERY})', params,
+                           output_field=FloatField())
+    )
+
+
+def search_documents(queryset, value):
+    terms = value.lower().split()[:MAX_TERMS]
+    return queryset.filter(*(
+        Q(search_document__contains=term) for term in terms
+    )).annotate(
+        search_rank=Case(
+            When(search_document__startswith=' '.join(terms),
+                 then=Value(1)),
+            default=Value(0),
+            output_field=IntegerField()
+        )
+    )
+
+
+def search(queryset, value):
+    """Рецепты, подходящие под запрос, от более релевантных к менее."""
+    if connections[queryset.db].vendor == 'postgresql':
+        queryset = search_postgresql(queryset, value)
+    else:
+        queryset = search_documents(queryset, value)
+    return queryset.order_by('-search_rank', *Recipe._meta.ordering)
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import counters, search
+from .models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingCart)
+
+
+def get_counter(sender):
+    for counter in counters.COUNTERS:
+        if counter.source is sender:
+            return counter
+    return None
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def counted_object_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counter = get_counter(sender)
+        counters.adjust(
+            counter, [getattr(instance, counter.foreign_key)], 1)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def counted_object_deleted(sender, instance, **kwargs):
+    counter = get_counter(sender)
+    counters.adjust(counter, [getattr(instance, counter.foreign_key)], -1)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.update_documents(RecipeIngredient.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
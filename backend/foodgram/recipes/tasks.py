@@ -0,0 +1,39 @@
+from django.db import transaction
+from jobs import queue
+from jobs.registry import task
+
+from . import images
+from .models import Recipe
+
+RENDITIONS = 'recipes.renditions'
+
+
+@task(RENDITIONS)
+def make_renditions(payload):
+    """Строит уменьшенные копии изображения рецепта.
+
+    Копии считаются вне транзакции, а записываются под блокировкой
+    строки и только если изображение рецепта не успели заменить: для
+    нового изображения поставлена своя задача.
+    """
+    recipe = Recipe.objects.filter(
+        pk=payload['recipe_id'], image=payload['image']).first()
+    if recipe is None:
+        return
+    renditions = images.make_renditions(recipe.image)
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update().filter(
+            pk=payload['recipe_id'], image=payload['image']).first()
+        if recipe is None:
+            return
+        for name, file in renditions.items():
+            getattr(recipe, f'image_{name}').save(
+                file.name, file, save=False)
+        recipe.save(update_fields=[
+            *(f'image_{name}' for name in renditions), 'updated_at'])
+
+
+def schedule_renditions(recipe):
+    """Ставит построение копий для текущего изображения рецепта."""
+    return queue.enqueue(
+        RENDITIONS, {'recipe_id': recipe.pk, 'image': recipe.image.name})
@@ -0,0 +1,88 @@
+import base64
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from recipes import images, search
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+from users.models import User
+
+
+class DecodeDataUriTest(SimpleTestCase):
+    content = bytes(range(256)) * 40
+
+    def decode(self, encoded):
+        return images.decode_data_uri(f'data:image/png;base64,{encoded}')
+
+    def test_plain(self):
+        self.assertEqual(
+            self.decode(base64.b64encode(self.content).decode()),
+            self.content)
+
+    def test_line_wrapped(self):
+        self.assertEqual(
+            self.decode(base64.encodebytes(self.content).decode()),
+            self.content)
+
+    def test_invalid(self):
+        for encoded in ('abc', 'ab!d'):
+            with self.subTest(encoded=encoded):
+                with self.assertRaises(images.ImageError):
+                    self.decode(encoded)
+
+    def test_not_data_uri(self):
+        with self.assertRaises(images.ImageError):
+            images.decode_data_uri('aGVsbG8=')
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_too_large(self):
+        with self.assertRaises(images.ImageError):
+            self.decode(base64.b64encode(self.content).decode())
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'столбец search_vector есть только на PostgreSQL')
+class PostgreSQLSearchTest(TestCase):
+    """Поиск по генерируемому столбцу search_vector (миграция 0011):
+    совпадение в названии выше совпадения в ингредиентах, а то — выше
+    совпадения в тексте."""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create(
+            username='author', email='author@example.com',
+            first_name='Имя', last_name='Фамилия')
+        ingredient = Ingredient.objects.create(
+            name='Борщ', measurement_unit='г')
+        cls.recipes = {}
+        for key, name, text in (
+                ('name', 'Борщ', 'Суп'),
+                ('ingredient', 'Суп', 'Суп'),
+                ('text', 'Салат', 'Совсем не борщ'),
+                ('other', 'Каша', 'Овсяная')):
+            cls.recipes[key] = Recipe.objects.create(
+                author=author, name=name, image='recipes/x.png', text=text,
+                cooking_time=10)
+        RecipeIngredient.objects.create(
+            recipe=cls.recipes['ingredient'], ingredient=ingredient,
+            amount=1)
+        search.update_documents(
+            [recipe.pk for recipe in cls.recipes.values()])
+
+    def find(self, query):
+        return list(search.search(Recipe.objects.all(), query).values_list(
+            'pk', flat=True))
+
+    def test_ranking(self):
+        self.assertEqual(self.find('борщ'), [
+            self.recipes[key].pk for key in ('name', 'ingredient', 'text')])
+
+    def test_websearch_syntax(self):
+        self.assertEqual(self.find('борщ -салат'), [
+            self.recipes[key].pk for key in ('name', 'ingredient')])
+
+    def test_vector_follows_document(self):
+        Recipe.objects.filter(pk=self.recipes['other'].pk).update(
+            name='Овсяный борщ')
+        search.update_documents([self.recipes['other'].pk])
+        self.assertIn(self.recipes['other'].pk, self.find('борщ'))
@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """Стандартный pbkdf2_sha256 с числом итераций из
+    PASSWORD_HASH_ITERATIONS (по умолчанию — как у Django).
+
+    Алгоритм тот же, поэтому хэши стандартного хэшера проверяются как
+    обычно и пересчитываются при входе, только если число итераций в них
+    отличается от заданного.
+    """
+
+    @property
+    def iterations(self):
+        return (settings.PASSWORD_HASH_ITERATIONS
+                or PBKDF2PasswordHasher.iterations)
@@ -0,0 +1,37 @@
+from django.contrib.auth.hashers import (PBKDF2PasswordHasher, check_password,
+                                         make_password)
+from django.test import SimpleTestCase, override_settings
+
+TUNED_HASHERS = [
+    'users.hashers.TunedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
+
+
+class TunedPBKDF2PasswordHasherTest(SimpleTestCase):
+    """Настраиваемый хэшер пересчитывает стандартные хэши, только если
+    число итераций отличается."""
+
+    def setUp(self):
+        self.encoded = make_password(
+            'password', hasher=PBKDF2PasswordHasher())
+
+    def check(self):
+        rehashed = []
+        self.assertTrue(check_password(
+            'password', self.encoded, setter=rehashed.append))
+        return bool(rehashed)
+
+    @override_settings(PASSWORD_HASHERS=TUNED_HASHERS,
+                       PASSWORD_HASH_ITERATIONS=0)
+    def test_same_iterations_not_rehashed(self):
+        self.assertFalse(self.check())
+
+    @override_settings(PASSWORD_HASHERS=TUNED_HASHERS,
+                       PASSWORD_HASH_ITERATIONS=(
+                           PBKDF2PasswordHasher.iterations + 1000))
+    def test_other_iterations_rehashed(self):
+        self.assertTrue(self.check())
+        self.assertEqual(
+            make_password('password').split('$')[:2],
+            ['pbkdf2_sha256', str(PBKDF2PasswordHasher.iterations + 1000)])